@@ -1,67 +1,106 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file
+from flask import Flask, render_template, request, redirect, url_for, send_file, jsonify, Response, stream_with_context, g
 import pandas as pd
+import contextvars
 import io
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+from code_cache import CodeCache
+from downcast import optimize_dtypes
+from formats import FORMATS, UnsupportedFormatError, format_for_filename, negotiate_output_format, read_path, \
+    write_buffer, write_path
+from jobs import JobQueue, JobStore, QueueFullError
+from llm import get_client
+from pipelines import PipelineError, PipelineNotFound, PipelineStore, apply_pipeline, validate_name
+from profiling import Profile, format_metric, memory_saved_bytes, render_metrics, span
+from sandbox import SandboxPool, run_code
+from sampling import validation_sample
+from schema import column_batches, format_schema, profile_columns
+from vectorize import format_timings, instrument, vectorize_code
+
+# Load environment variables before any configuration below is read
+load_dotenv()
 
 app = Flask(__name__)
 
-@app.route('/')
-def index():
-    return render_template('upload.html')
+# Validated generated code, keyed by the upload's schema and the prompt template
+code_cache = CodeCache(
+    os.getenv('CODE_CACHE_DIR', os.path.join('cache', 'code')),
+    max_entries=int(os.getenv('CODE_CACHE_MAX_ENTRIES', '256')),
+    ttl=float(os.getenv('CODE_CACHE_TTL', str(7 * 24 * 3600))),
+)
 
-@app.route('/upload', methods=['POST'])
-def upload_file():
-    if 'file' not in request.files:
-        return redirect(url_for('index'))
-    
-    file = request.files['file']
-    
-    if file.filename == '':
-        return redirect(url_for('index'))
-    
-    if file and file.filename.endswith('.csv'):
-        # Read the CSV file
-        df = pd.read_csv(file)
-        
-        # Perform data cleaning and processing
-        processed_df = auto_clean_feature_data(df)
-        
-        # Convert the processed dataframe back to CSV
-        output = io.StringIO()
-        processed_df.to_csv(output, index=False)
-        output.seek(0)
-        
-        # Send the processed file back to the user
-        return send_file(
-            io.BytesIO(output.getvalue().encode()),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name='processed_data.csv'
-        )
-    
-    return redirect(url_for('index'))
+# Streaming mode: rows used to generate and validate the code, and rows per processed chunk
+STREAM_SAMPLE_ROWS = int(os.getenv('STREAM_SAMPLE_ROWS', '1000'))
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', '100000'))
+STREAM_BY_DEFAULT = os.getenv('STREAM_BY_DEFAULT', '0')
 
-def auto_clean_feature_data(df):
-    import google.generativeai as genai
-    from dotenv import load_dotenv
-    import os
-    import re
+# Generated code runs in a pool of worker processes with a per-job timeout and memory cap;
+# SANDBOX_WORKERS=0 runs it in the web process instead
+SANDBOX_WORKERS = int(os.getenv('SANDBOX_WORKERS', str(os.cpu_count() or 1)))
+sandbox_pool = SandboxPool(
+    SANDBOX_WORKERS,
+    timeout=float(os.getenv('SANDBOX_TIMEOUT', '60')),
+    memory_limit=int(os.getenv('SANDBOX_MEMORY_LIMIT_MB', '4096')) * 1024 * 1024,
+) if SANDBOX_WORKERS > 0 else None
+
+# Row-wise pandas code in generated output: 'off', 'rewrite' (vectorize what we can and report
+# the rest) or 'retry' (also ask Gemini to vectorize what is left, for frames of at least
+# VECTORIZE_RETRY_MIN_ROWS rows where the slowdown matters)
+VECTORIZE_MODE = os.getenv('VECTORIZE_MODE', 'retry')
+VECTORIZE_RETRY_MIN_ROWS = int(os.getenv('VECTORIZE_RETRY_MIN_ROWS', '100000'))
+
+# Retries run against a validation sample of this many rows (including nulls and odd values
+# from every column); only the accepted code touches the full data. 0 disables sampling.
+VALIDATION_SAMPLE_ROWS = int(os.getenv('VALIDATION_SAMPLE_ROWS', '2000'))
 
-    # Load environment variables
-    load_dotenv()
+# Speculative generation: request this many candidates concurrently and keep the 'first-valid'
+# one or, with 'fastest', the quickest on the validation sample. 1 disables it.
+SPECULATIVE_CANDIDATES = int(os.getenv('SPECULATIVE_CANDIDATES', '1'))
+SPECULATIVE_POLICY = os.getenv('SPECULATIVE_POLICY', 'first-valid')
 
-    # Configure the Gemini API
-    genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+# Background jobs: submitted uploads are processed on a bounded pool and polled for completion
+JOB_DIR = os.getenv('JOB_DIR', 'jobs')
+job_store = JobStore(os.path.join(JOB_DIR, 'jobs.db'), ttl=float(os.getenv('JOB_TTL', str(24 * 3600))))
 
-    # Function to generate code using Gemini
-    def generate_code_with_gemini(prompt):
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
+# Every request and job is profiled: stage timings and peak memory ('rss', 'tracemalloc' or 'off')
+# go to /metrics and a JSON log line. With PROFILE_ALLOW_CPROFILE=1, a request with profile=1
+# (form or query) or an X-Profile: 1 header also gets a cProfile capture saved under PROFILE_DIR.
+PROFILE_MEMORY = os.getenv('PROFILE_MEMORY', 'rss')
+PROFILE_ALLOW_CPROFILE = os.getenv('PROFILE_ALLOW_CPROFILE', '0') in ('1', 'true')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
 
-    # Prepare the prompt for Gemini
-    columns = ', '.join(df.columns)
-    prompt = f"""
-    Given a DataFrame with the following columns: {columns}
+# The prompt lists a typed schema (dtype, null rate, distinct values, range) profiled on up to
+# SCHEMA_SAMPLE_ROWS rows. Frames with more than PROMPT_BATCH_COLUMNS columns are split into
+# batches that are generated in parallel (PROMPT_BATCH_WORKERS at a time) and merged.
+SCHEMA_SAMPLE_ROWS = int(os.getenv('SCHEMA_SAMPLE_ROWS', '20000'))
+PROMPT_BATCH_COLUMNS = int(os.getenv('PROMPT_BATCH_COLUMNS', '200'))
+PROMPT_BATCH_WORKERS = int(os.getenv('PROMPT_BATCH_WORKERS', '4'))
+
+# Uploads sent with pipeline_name save their accepted code as a versioned pipeline under
+# PIPELINE_DIR, which /pipelines/<name>/apply (or `python pipelines.py apply`) replays without the LLM
+pipeline_store = PipelineStore(os.getenv('PIPELINE_DIR', 'pipelines'))
+
+# Dtype optimization around the generated code: 'input' shrinks the uploaded frame's text columns
+# before it runs, 'output' the columns it added (numbers are downcast too), 'both' does both and
+# 'off' neither. Text columns with at most OPTIMIZE_CATEGORY_RATIO distinct values per row become
+# categoricals; OPTIMIZE_ARROW_STRINGS=1 also moves other text columns to Arrow-backed strings.
+OPTIMIZE_DTYPES = os.getenv('OPTIMIZE_DTYPES', 'off')
+OPTIMIZE_CATEGORY_RATIO = float(os.getenv('OPTIMIZE_CATEGORY_RATIO', '0.5'))
+OPTIMIZE_ARROW_STRINGS = os.getenv('OPTIMIZE_ARROW_STRINGS', '0') in ('1', 'true')
+
+PROMPT_TEMPLATE = """
+    Given a DataFrame with the following columns (name: dtype, null rate, distinct values, min..max):
+{columns}
+    The columns already have these dtypes. Only convert a column when its dtype does not fit how
+    it is used, for example text columns that are mostly numeric text. Category columns reach the
+    code as plain text columns.
     Generate Python code to create new columns based on existing ones.
     The code should:
     1. Create new columns
@@ -99,21 +138,556 @@ def auto_clean_feature_data(df):
     df = process_dataframe(df)
     """
 
-    # Function to execute generated code and handle errors
-    def execute_generated_code(code, df, prompt, max_tries=3):
-        for attempt in range(max_tries):
+@app.before_request
+def start_profile():
+    if request.endpoint in (None, 'static', 'metrics'):
+        return
+    g.profile = Profile(
+        request.endpoint,
+        memory=PROFILE_MEMORY,
+        cprofile=PROFILE_ALLOW_CPROFILE and profile_requested(),
+        cprofile_dir=PROFILE_DIR,
+    ).__enter__()
+
+@app.after_request
+def record_status(response):
+    profile = g.get('profile')
+    if profile is not None:
+        profile.status = str(response.status_code)
+        response.headers['X-Profile-Id'] = profile.id
+    return response
+
+@app.teardown_request
+def finish_profile(error=None):
+    # Streaming views finish their profile themselves once the response is closed
+    if g.get('profile_streaming'):
+        return
+    profile = g.pop('profile', None)
+    if profile is not None:
+        if error is not None:
+            profile.status = 'error'
+        profile.__exit__(None, None, None)
+
+@app.route('/')
+def index():
+    return render_template('upload.html')
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    if 'file' not in request.files:
+        return redirect(url_for('index'))
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return redirect(url_for('index'))
+    
+    input_format = format_for_filename(file.filename)
+    if file and input_format is not None:
+        try:
+            output_format = requested_output_format()
+            pipeline_name = requested_pipeline_name()
+        except (UnsupportedFormatError, PipelineError) as e:
+            return str(e), 400
+
+        # Large CSV files are processed chunk by chunk so memory stays bounded by the chunk size
+        if stream_requested() and input_format == 'csv' and output_format == 'csv':
+            return stream_processed_csv(file, pipeline_name)
+
+        # Read the uploaded file
+        with span('read'):
+            df = read_upload(file, input_format)
+        
+        # Perform data cleaning and processing
+        report = {}
+        optimize_frame(df, 'input', report)
+        processed_df, code = generate_feature_code(df, report)
+        optimize_frame(processed_df, 'output', report, columns=added_columns(df, processed_df))
+        pipeline = save_pipeline(pipeline_name, code, df, processed_df, file.filename, optimize_settings())
+        
+        # Send the processed file back to the user in the requested format
+        mimetype, extension = FORMATS[output_format]
+        with span('serialize'):
+            output = write_buffer(processed_df, output_format)
+        response = send_file(
+            output,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=f'processed_data{extension}'
+        )
+        if pipeline is not None:
+            response.headers['X-Pipeline-Version'] = str(pipeline['version'])
+        if 'memory' in report:
+            response.headers['X-Memory-Saved-Bytes'] = str(report['memory']['bytes_saved'])
+        return response
+    
+    return redirect(url_for('index'))
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'No file was uploaded'}), 400
+    input_format = format_for_filename(file.filename)
+    if input_format is None:
+        return jsonify({'error': 'Only CSV, Parquet and Feather/Arrow files are supported'}), 400
+    try:
+        output_format = requested_output_format()
+        pipeline_name = requested_pipeline_name()
+    except (UnsupportedFormatError, PipelineError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    options = {
+        'stream': stream_requested(),
+        'input_format': input_format,
+        'output_format': output_format,
+        'pipeline_name': pipeline_name,
+        'filename': file.filename,
+    }
+    try:
+        job_id = job_queue.submit(file.save, options)
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': url_for('job_status', job_id=job_id),
+        'result_url': url_for('job_result', job_id=job_id),
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+
+    status = {key: job[key] for key in ('status', 'created', 'updated', 'error', 'report')}
+    status['job_id'] = job_id
+    if job['status'] == 'done':
+        status['result_url'] = url_for('job_result', job_id=job_id)
+        status['download_name'] = job['download_name']
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': f"Job is {job['status']}", 'status': job['status']}), 409
+
+    return send_file(
+        job['result_path'],
+        mimetype=job['mimetype'],
+        as_attachment=True,
+        download_name=job['download_name']
+    )
+
+@app.route('/llm/metrics')
+def llm_metrics():
+    return jsonify(get_client().metrics())
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text format: request/stage latency histograms, peak memory and LLM call counters
+    lines = render_metrics()
+    llm = get_client().metrics()
+    for key in ('calls', 'errors', 'retries', 'rate_limited'):
+        lines.extend(format_metric(f'autofe_llm_{key}_total', 'counter', f'LLM {key.replace("_", " ")}', llm[key]))
+    lines.extend(format_metric('autofe_llm_latency_seconds_total', 'counter', 'Time spent in LLM calls',
+                               llm['latency_seconds_total']))
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(code_cache.stats())
+
+@app.route('/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    # Drop a single schema's code when a key is given, otherwise clear the cache
+    key = request.form.get('key') or None
+    try:
+        removed = code_cache.invalidate(key)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'removed': removed})
+
+@app.route('/pipelines')
+def list_pipelines():
+    return jsonify(pipeline_store.list())
+
+@app.route('/pipelines/<name>')
+def get_pipeline(name):
+    try:
+        return jsonify(pipeline_store.get(name, request.args.get('version', type=int)))
+    except PipelineNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except PipelineError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/pipelines/<name>/apply', methods=['POST'])
+def apply_saved_pipeline(name):
+    # Replays saved code on one or more files without calling the LLM. Several files are
+    # processed in parallel on the sandbox pool and returned as a zip with a report.json.
+    files = [file for file in request.files.getlist('file') if file.filename]
+    if not files:
+        return jsonify({'error': 'No file was uploaded'}), 400
+    if any(format_for_filename(file.filename) is None for file in files):
+        return jsonify({'error': 'Only CSV, Parquet and Feather/Arrow files are supported'}), 400
+    try:
+        pipeline = pipeline_store.get(name, request.values.get('version', type=int))
+        output_format = requested_output_format()
+    except PipelineNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except (UnsupportedFormatError, PipelineError) as e:
+        return jsonify({'error': str(e)}), 400
+    mimetype, extension = FORMATS[output_format]
+
+    def apply_file(file):
+        with span('read'):
+            df = read_upload(file, format_for_filename(file.filename))
+        runner = sandbox_pool.run if sandbox_pool is not None else None
+        with span('exec'):
+            return apply_pipeline(pipeline, df, runner)
+
+    if len(files) == 1:
+        try:
+            processed_df, warnings = apply_file(files[0])
+        except PipelineError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': f'Pipeline failed on {files[0].filename}: {type(e).__name__}: {e}'}), 422
+        with span('serialize'):
+            output = write_buffer(processed_df, output_format)
+        response = send_file(output, mimetype=mimetype, as_attachment=True,
+                             download_name=f'processed_data{extension}')
+        response.headers['X-Pipeline-Version'] = str(pipeline['version'])
+        if warnings:
+            response.headers['X-Pipeline-Warnings'] = '; '.join(warnings)
+        return response
+
+    # Each thread hands its file to a sandbox worker, so files run on separate cores
+    workers = max(1, min(len(files), SANDBOX_WORKERS))
+    report = {'pipeline': name, 'version': pipeline['version'], 'files': []}
+    archive = io.BytesIO()
+    with ThreadPoolExecutor(max_workers=workers) as executor, zipfile.ZipFile(archive, 'w') as zf:
+        futures = [executor.submit(contextvars.copy_context().run, apply_file, file) for file in files]
+        for file, future in zip(files, futures):
             try:
-                df_copy = df.copy()
-                exec(code, globals(), {'df': df_copy})
-                if len(df_copy.columns) > len(df.columns):
-                    return df_copy
-                else:
-                    raise ValueError("No new columns were added to the DataFrame")
+                processed_df, warnings = future.result()
             except Exception as e:
-                error_message = f"Error in attempt {attempt + 1}: {str(e)}"
-                print(error_message)
-                
-                error_prompt = f"""
+                report['files'].append({'input': file.filename, 'error': f'{type(e).__name__}: {e}'})
+                continue
+            output_name = f'{os.path.splitext(os.path.basename(file.filename))[0]}{extension}'
+            with span('serialize'):
+                zf.writestr(output_name, write_buffer(processed_df, output_format).read())
+            report['files'].append({
+                'input': file.filename,
+                'output': output_name,
+                'rows': len(processed_df),
+                'warnings': warnings,
+            })
+        zf.writestr('report.json', json.dumps(report, indent=2))
+    archive.seek(0)
+    response = send_file(archive, mimetype='application/zip', as_attachment=True,
+                         download_name=f'{name}-v{pipeline["version"]}.zip')
+    response.headers['X-Pipeline-Version'] = str(pipeline['version'])
+    return response
+
+def profile_requested():
+    return (request.values.get('profile') or request.headers.get('X-Profile', '0')) in ('1', 'true', 'on')
+
+def stream_requested():
+    return request.form.get('stream', STREAM_BY_DEFAULT) in ('1', 'true', 'on')
+
+def requested_output_format():
+    # An explicit output_format form field wins over the Accept header; CSV otherwise
+    return negotiate_output_format(request.form.get('output_format'), request.accept_mimetypes)
+
+def requested_pipeline_name():
+    name = request.form.get('pipeline_name') or None
+    return validate_name(name) if name else None
+
+def save_pipeline(name, code, df, processed_df, source=None, optimize=None):
+    # Nothing is saved when no generated code worked and the upload came back unchanged.
+    # optimize is the dtype optimization that was applied, replayed whenever the pipeline runs.
+    if not name or code is None:
+        return None
+    pipeline = pipeline_store.save(name, code, df, processed_df, source=source, optimize=optimize)
+    print(f"Saved pipeline {name} version {pipeline['version']}")
+    return pipeline
+
+def optimize_settings():
+    return {
+        'input': OPTIMIZE_DTYPES in ('input', 'both'),
+        'output': OPTIMIZE_DTYPES in ('output', 'both'),
+        'max_category_ratio': OPTIMIZE_CATEGORY_RATIO,
+        'arrow_strings': OPTIMIZE_ARROW_STRINGS,
+    }
+
+def added_columns(df, processed_df):
+    return [column for column in processed_df.columns if column not in df.columns]
+
+def optimize_frame(df, stage, report, columns=None):
+    # Shrinks df's dtypes in place when OPTIMIZE_DTYPES covers this stage ('input' or 'output')
+    # and records the bytes saved under report['memory']
+    if OPTIMIZE_DTYPES not in (stage, 'both'):
+        return
+    with span(f'optimize_{stage}'):
+        result = optimize_dtypes(
+            df,
+            columns,
+            max_category_ratio=OPTIMIZE_CATEGORY_RATIO,
+            # Input numbers keep their dtypes: generated arithmetic on narrowed integers would wrap around
+            numbers=stage == 'output',
+            arrow_strings=OPTIMIZE_ARROW_STRINGS,
+        )
+    memory = report.setdefault('memory', {'bytes_saved': 0})
+    memory[stage] = result
+    memory['bytes_saved'] += result['bytes_saved']
+    memory_saved_bytes.inc(result['bytes_saved'], stage=stage)
+    print(f"Optimized {stage} dtypes: {result['bytes_before']:,} -> {result['bytes_after']:,} bytes "
+          f"({len(result['columns'])} columns converted)")
+
+def read_upload(file, input_format):
+    if input_format == 'csv':
+        return pd.read_csv(file)
+    # Columnar files are memory-mapped, which needs them on disk
+    fd, path = tempfile.mkstemp(suffix=FORMATS[input_format][1])
+    os.close(fd)
+    try:
+        file.save(path)
+        return read_path(path, input_format)
+    finally:
+        os.remove(path)
+
+def process_upload_job(input_path, output_path, options, report):
+    # Runs on the job pool: read the saved upload, add features and write the result file
+    input_format = options.get('input_format', 'csv')
+    output_format = options.get('output_format', 'csv')
+    profile = Profile('job', memory=PROFILE_MEMORY)
+    try:
+        with profile:
+            if options.get('stream') and input_format == 'csv' and output_format == 'csv':
+                with span('read'):
+                    sample = pd.read_csv(input_path, nrows=STREAM_SAMPLE_ROWS)
+                processed_sample, code = generate_feature_code(sample)
+                pipeline = save_pipeline(options.get('pipeline_name'), code, sample, processed_sample,
+                                         options.get('filename'))
+                failed_chunks = []
+                with open(output_path, 'w', encoding='utf-8', newline='') as f:
+                    for text in process_chunks(input_path, code, processed_sample.columns, failed_chunks):
+                        with span('write'):
+                            f.write(text)
+                if failed_chunks:
+                    report['failed_chunks'] = failed_chunks
+            else:
+                with span('read'):
+                    df = read_path(input_path, input_format)
+                optimize_frame(df, 'input', report)
+                processed_df, code = generate_feature_code(df, report)
+                optimize_frame(processed_df, 'output', report, columns=added_columns(df, processed_df))
+                pipeline = save_pipeline(options.get('pipeline_name'), code, df, processed_df,
+                                         options.get('filename'), optimize_settings())
+                with span('serialize'):
+                    write_path(processed_df, output_path, output_format)
+            if pipeline is not None:
+                report['pipeline'] = {'name': pipeline['name'], 'version': pipeline['version']}
+    finally:
+        report['profile'] = profile.summary
+    mimetype, extension = FORMATS[output_format]
+    return f'processed_data{extension}', mimetype
+
+def stream_processed_csv(file, pipeline_name=None):
+    # The upload is closed once the view returns, so spool it to disk for the response generator
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    file.save(path)
+
+    # Generate and validate the code on a sample so the LLM never sees the full file
+    try:
+        with span('read'):
+            sample = pd.read_csv(path, nrows=STREAM_SAMPLE_ROWS)
+        processed_sample, code = generate_feature_code(sample)
+        # Output dtypes are recorded from the processed sample
+        pipeline = save_pipeline(pipeline_name, code, sample, processed_sample, file.filename)
+    except Exception:
+        os.remove(path)
+        raise
+
+    output_columns = list(processed_sample.columns)
+
+    # The request is torn down before the body is sent, so the response finishes the profile
+    profile = g.get('profile')
+    g.profile_streaming = True
+
+    def generate():
+        try:
+            if profile is None:
+                yield from process_chunks(path, code, output_columns)
+            else:
+                with profile.bind():
+                    yield from process_chunks(path, code, output_columns)
+        except Exception:
+            if profile is not None:
+                profile.status = 'error'
+            raise
+
+    def cleanup():
+        # Runs when the server closes the response, even if the client left before the first
+        # chunk and the generator never started
+        if os.path.exists(path):
+            os.remove(path)
+        if profile is not None:
+            profile.__exit__(None, None, None)
+
+    headers = {'Content-Disposition': 'attachment; filename=processed_data.csv'}
+    if pipeline is not None:
+        headers['X-Pipeline-Version'] = str(pipeline['version'])
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers=headers
+    )
+    response.call_on_close(cleanup)
+    return response
+
+class ChunkError(Exception):
+    pass
+
+
+def process_chunks(path, code, output_columns, failed_chunks=None):
+    # Every chunk is written with the columns the code produced on the sample. When the code
+    # fails on a chunk, the stream is aborted; if a failed_chunks list is given instead, the
+    # chunk's row range and error are recorded there and its rows go out without features.
+    output_columns = list(output_columns)
+    chunks = pd.read_csv(path, chunksize=STREAM_CHUNK_ROWS)
+    start_row = 0
+    header = True
+    while True:
+        with span('read'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        end_row = start_row + len(chunk)
+        if code is not None:
+            try:
+                chunk = run_generated_code(code, chunk)
+            except Exception as e:
+                message = f"Generated code failed on rows {start_row}-{end_row - 1}: {str(e)}"
+                print(message)
+                if failed_chunks is None:
+                    raise ChunkError(message) from e
+                failed_chunks.append({'rows': [start_row, end_row - 1], 'error': str(e)})
+        with span('serialize'):
+            text = chunk.reindex(columns=output_columns).to_csv(index=False, header=header)
+        header = False
+        start_row = end_row
+        yield text
+
+class VectorizationError(Exception):
+    pass
+
+
+class CandidateError(Exception):
+    # A speculative candidate whose code was extracted but failed validation
+    def __init__(self, code, error):
+        super().__init__(str(error))
+        self.code = code
+        self.error = error
+
+
+def vectorize_generated_code(code, row_count, allow_retry):
+    # Rewrite simple row-wise lambdas into Series operations before the code is run
+    if VECTORIZE_MODE == 'off':
+        return code
+    with span('vectorize'):
+        code, rewrites, findings = vectorize_code(code)
+    for rewrite in rewrites:
+        print(f"Vectorized {rewrite}")
+    if findings:
+        message = "Row-wise pandas code found, rewrite it with vectorized Series operations instead:\n" + \
+            '\n'.join(str(finding) for finding in findings)
+        if VECTORIZE_MODE == 'retry' and allow_retry and row_count >= VECTORIZE_RETRY_MIN_ROWS:
+            raise VectorizationError(message)
+        print(message)
+    return code
+
+
+def run_generated_code(code, df, report=None):
+    # The sandbox works on its own deserialized copy, so df is never modified here
+    instrumented_code = instrument(code)
+    start = time.perf_counter()
+    if sandbox_pool is not None:
+        # Includes sending the frame to the worker and reading the result back
+        with span('sandbox'):
+            processed_df, timings = sandbox_pool.run(instrumented_code, df)
+    else:
+        with span('copy'):
+            df_copy = df.copy()
+        with span('exec'):
+            processed_df, timings = run_code(instrumented_code, df_copy)
+    elapsed = time.perf_counter() - start
+    if len(processed_df.columns) > len(df.columns):
+        if report is not None:
+            report['seconds'] = elapsed
+            report['feature_timings'] = format_timings(timings)
+            if report['feature_timings']:
+                print("Per-column timings:")
+                for column, seconds in report['feature_timings']:
+                    print(f"  {column}: {seconds:.4f}s")
+        return processed_df
+    else:
+        raise ValueError("No new columns were added to the DataFrame")
+
+
+def generate_code_with_gemini(prompt):
+    # The process-wide client handles concurrency, rate limiting and retries on 429s
+    with span('llm'):
+        return get_client().generate(prompt)
+
+
+def auto_clean_feature_data(df, report=None):
+    processed_df, _ = generate_feature_code(df, report)
+    return processed_df
+
+
+def generate_feature_code(df, report=None):
+    # Returns the processed DataFrame and the code that produced it (None if no code worked).
+    # The report dict is filled with details such as per-column and sample-vs-full timings.
+    if report is None:
+        report = {}
+
+    # Reuse code that already worked for an upload with the same schema
+    with span('cache'):
+        cache_key = code_cache.key_for(df, PROMPT_TEMPLATE)
+        cached_code = code_cache.get(cache_key)
+    if cached_code is not None:
+        try:
+            return run_generated_code(cached_code, df, report), cached_code
+        except Exception as e:
+            print(f"Cached code failed, regenerating: {str(e)}")
+            code_cache.invalidate(cache_key)
+
+    # Very wide frames get one prompt per batch of columns instead of one huge prompt
+    if PROMPT_BATCH_COLUMNS > 0 and len(df.columns) > PROMPT_BATCH_COLUMNS:
+        processed_df, code = generate_feature_code_in_batches(df, report)
+        if code is not None:
+            code_cache.put(cache_key, code, columns=df.columns)
+        return processed_df, code
+
+    import re
+
+    # Prepare the prompt for Gemini with a compact typed schema of the columns
+    with span('prompt'):
+        schema = format_schema(profile_columns(df, sample_rows=SCHEMA_SAMPLE_ROWS))
+        prompt = PROMPT_TEMPLATE.format(columns=schema)
+    row_count = len(df)
+
+    # Function to ask Gemini to fix code that failed
+    def request_fix(prompt, code, error_message):
+        error_prompt = f"""
                 {prompt}
 
                 The previous code produced an error or did not add any new columns. Please fix the code and try again.
@@ -125,39 +699,241 @@ def auto_clean_feature_data(df):
                 Please provide corrected code that addresses this error, ensures new columns are added, and follows the original instructions.
                 Only provide Python code as output.
                 """
-                
-                code = generate_code_with_gemini(error_prompt)
-                code_match = re.search(r'```python\n(.*?)```', code, re.DOTALL)
-                if code_match:
-                    code = code_match.group(1).strip()
-                else:
-                    print("No Python code block found in the generated content")
-                    continue  # Try again with a new generation
+
+        code = generate_code_with_gemini(error_prompt)
+        extracted_code = extract_code(code)
+        if extracted_code is not None:
+            return extracted_code
+        print("No Python code block found in the generated content")
+        return code
+
+    # Function to execute generated code and handle errors
+    def execute_generated_code(code, df, prompt, max_tries=3, stage_report=None):
+        for attempt in range(max_tries):
+            try:
+                code = vectorize_generated_code(code, row_count, allow_retry=attempt < max_tries - 1)
+                return run_generated_code(code, df, stage_report), code
+            except Exception as e:
+                error_message = f"Error in attempt {attempt + 1}: {str(e)}"
+                print(error_message)
+                code = request_fix(prompt, code, error_message)
         
         print(f"Failed to generate working code after {max_tries} attempts.")
         raise ValueError("Unable to process the DataFrame")
 
-    # Generate initial code using Gemini
-    generated_code = generate_code_with_gemini(prompt)
+    # Retries (and speculative candidates) are validated on a small sample when the frame is large
+    use_sample = VALIDATION_SAMPLE_ROWS > 0 and len(df) > VALIDATION_SAMPLE_ROWS
+    with span('sample'):
+        sample = validation_sample(df, VALIDATION_SAMPLE_ROWS) if use_sample else df
+
+    # Function to run code accepted on the sample once on the full data
+    def run_on_full_data(code, sample_report):
+        validation = {
+            'sample_rows': len(sample),
+            'full_rows': len(df),
+            'sample_seconds': sample_report['seconds'],
+        }
+        report['validation'] = validation
+
+        try:
+            processed_df = run_generated_code(code, df, report)
+        except Exception as e:
+            # The sample missed something; give Gemini one chance to fix it against the full data
+            validation['full_data_error'] = str(e)
+            print(f"Code passed on the sample but failed on the full data: {str(e)}")
+            code = request_fix(prompt, code, f"The code worked on a sample but failed on the full data: {str(e)}")
+            try:
+                code = vectorize_generated_code(code, row_count, allow_retry=False)
+                processed_df = run_generated_code(code, df, report)
+            except Exception as e:
+                print(f"Fixed code also failed on the full data: {str(e)}")
+                raise ValueError("Unable to process the DataFrame") from e
+
+        validation['full_seconds'] = report['seconds']
+        print(
+            f"Validated on {len(sample)} sample rows in {validation['sample_seconds']:.3f}s, "
+            f"ran on {len(df)} rows in {validation['full_seconds']:.3f}s"
+        )
+        return processed_df, code
+
+    # Function to run the retry loop on the sample and the accepted code once on the full data
+    def validate_on_sample(code):
+        sample_report = {}
+        _, code = execute_generated_code(code, sample, prompt, stage_report=sample_report)
+        return run_on_full_data(code, sample_report)
+
+    # Function to extract the code block from a Gemini response, or None
+    def extract_code(generated_code):
+        code_match = re.search(r'```python\n(.*?)```', generated_code, re.DOTALL)
+        return code_match.group(1).strip() if code_match else None
+
+    # Function to generate and validate one speculative candidate
+    def run_candidate(index, decided):
+        code = extract_code(generate_code_with_gemini(prompt))
+        if code is None:
+            raise ValueError("No Python code block found in the generated content")
+        # A winner was already picked while this LLM call ran, so don't take a sandbox worker
+        if decided.is_set():
+            raise ValueError("Skipped validation, another candidate already won")
+        candidate_report = {}
+        try:
+            code = vectorize_generated_code(code, row_count, allow_retry=False)
+            processed_sample = run_generated_code(code, sample, candidate_report)
+        except Exception as e:
+            raise CandidateError(code, e) from e
+        return index, code, processed_sample, candidate_report
 
-    # Extract code from markdown format
-    code_match = re.search(r'```python\n(.*?)```', generated_code, re.DOTALL)
+    # Function to race several candidates and keep the first valid or the fastest one
+    def speculate():
+        executor = ThreadPoolExecutor(max_workers=SPECULATIVE_CANDIDATES, thread_name_prefix='candidate')
+        decided = threading.Event()
+        # Candidates run in a copy of this context so their spans land in the request's profile
+        futures = [
+            executor.submit(contextvars.copy_context().run, run_candidate, index, decided)
+            for index in range(SPECULATIVE_CANDIDATES)
+        ]
+        valid = []
+        failed_code = None
+        try:
+            for future in as_completed(futures):
+                try:
+                    valid.append(future.result())
+                except CandidateError as e:
+                    print(f"Candidate failed: {str(e.error)}")
+                    failed_code = failed_code or e.code
+                except Exception as e:
+                    print(f"Candidate failed: {str(e)}")
+                if valid and SPECULATIVE_POLICY == 'first-valid':
+                    break
+        finally:
+            # Losers finish their LLM call in the background but skip validation
+            decided.set()
+            executor.shutdown(wait=False)
+
+        report['speculative'] = {
+            'candidates': SPECULATIVE_CANDIDATES,
+            'policy': SPECULATIVE_POLICY,
+            'valid': len(valid),
+        }
+        if not valid:
+            return None, failed_code
+
+        index, code, processed_sample, candidate_report = min(valid, key=lambda candidate: candidate[3]['seconds'])
+        report['speculative'].update({'winner': index, 'winner_seconds': candidate_report['seconds']})
+        print(f"Speculative generation picked candidate {index + 1} of {SPECULATIVE_CANDIDATES} "
+              f"({len(valid)} valid, {candidate_report['seconds']:.3f}s)")
+        if not use_sample:
+            report.update(candidate_report)
+            return (processed_sample, code), None
+        return run_on_full_data(code, candidate_report), None
+
+    if SPECULATIVE_CANDIDATES > 1:
+        try:
+            result, extracted_code = speculate()
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            return df, None
+        if result is not None:
+            code_cache.put(cache_key, result[1], columns=df.columns)
+            return result
+        if extracted_code is None:
+            print("No speculative candidate produced usable code")
+            return df, None
+        # Every candidate failed; fix one of them through the normal retry loop
+    else:
+        # Generate initial code using Gemini
+        generated_code = generate_code_with_gemini(prompt)
+
+        # Extract code from markdown format
+        extracted_code = extract_code(generated_code)
     
-    if code_match:
-        extracted_code = code_match.group(1).strip()
+    if extracted_code is not None:
         print("Extracted code:")
         print(extracted_code)
         
         # Execute the extracted code with error handling and retries
         try:
-            processed_df = execute_generated_code(extracted_code, df, prompt)
-            return processed_df
+            if use_sample:
+                processed_df, accepted_code = validate_on_sample(extracted_code)
+            else:
+                processed_df, accepted_code = execute_generated_code(extracted_code, df, prompt, stage_report=report)
+            code_cache.put(cache_key, accepted_code, columns=df.columns)
+            return processed_df, accepted_code
         except ValueError as e:
             print(f"Error: {str(e)}")
-            return df  # Return original DataFrame if processing fails
+            return df, None  # Return original DataFrame if processing fails
     else:
         print("No Python code block found in the generated content")
-        return df  # Return original DataFrame if no code is generated
+        return df, None  # Return original DataFrame if no code is generated
+
+
+def generate_feature_code_in_batches(df, report):
+    # Each batch of columns goes through generate_feature_code on its own (cache, validation and
+    # retries included); the new and converted columns of every batch are then merged
+    batches = column_batches(df.columns, PROMPT_BATCH_COLUMNS)
+    print(f"Generating code for {len(df.columns)} columns in {len(batches)} batches")
+    batch_reports = [{} for _ in batches]
+
+    def run_batch(index):
+        return generate_feature_code(df[batches[index]], batch_reports[index])
+
+    with ThreadPoolExecutor(max_workers=PROMPT_BATCH_WORKERS, thread_name_prefix='batch') as executor:
+        # Each batch runs in a copy of this context so its spans land in the request's profile
+        futures = [executor.submit(contextvars.copy_context().run, run_batch, index) for index in range(len(batches))]
+        results = [future.result() for future in futures]
+
+    existing, added, codes = [], [], []
+    report['batches'] = []
+    for columns, (processed_df, code), batch_report in zip(batches, results, batch_reports):
+        report['batches'].append(dict(batch_report, columns=len(columns), ok=code is not None))
+        codes.append(code)
+        if code is None:
+            existing.append(df[columns])
+            continue
+        # Code that dropped one of its batch's columns leaves the originals in place
+        existing.append(processed_df[columns] if set(columns) <= set(processed_df.columns) else df[columns])
+        added.append(processed_df.drop(columns=[column for column in columns if column in processed_df.columns]))
+
+    if not added:
+        print("No batch produced usable code")
+        return df, None
+
+    # Original columns keep their order, new ones follow; a name created by two batches keeps the last
+    merged = pd.concat(existing + added, axis=1)
+    merged = merged.loc[:, ~merged.columns.duplicated(keep='last')]
+    print(f"Merged {len(added)} of {len(batches)} batches into {len(merged.columns) - len(df.columns)} new columns")
+    return merged, combine_batch_code(batches, codes)
+
+
+def combine_batch_code(batches, codes):
+    # One program that runs each batch's code on its own columns and merges the results like
+    # generate_feature_code_in_batches, so cached and streamed runs give the same columns
+    lines = ['_source = df', '_existing, _added = [], []']
+    for columns, code in zip(batches, codes):
+        lines.append(f'_columns = {columns!r}')
+        if code is None:
+            lines.append('_existing.append(_source[_columns])')
+            continue
+        lines += [
+            'df = _source[_columns].copy()',
+            code,
+            '_existing.append(df[_columns] if set(_columns) <= set(df.columns) else _source[_columns])',
+            '_added.append(df.drop(columns=[column for column in _columns if column in df.columns]))',
+        ]
+    lines += [
+        'df = pd.concat(_existing + _added, axis=1)',
+        "df = df.loc[:, ~df.columns.duplicated(keep='last')]",
+    ]
+    return '\n'.join(lines)
+
+
+job_queue = JobQueue(
+    job_store,
+    process_upload_job,
+    JOB_DIR,
+    max_workers=int(os.getenv('JOB_WORKERS', '2')),
+    max_pending=int(os.getenv('JOB_MAX_PENDING', '16')),
+)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,290 @@
+"""Offline benchmarks for the /upload pipeline and the dashboard callback.
+
+Runs without network access: LLM calls go to a scripted stub backend and the
+data is synthetic. Examples:
+
+    python benchmarks/run.py --scenario upload dashboard --size 10k
+    python benchmarks/run.py --scenario upload --size 1m --llm-script ok,error,row-wise --check
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+
+SCENARIOS = ('upload', 'upload-cached', 'upload-stream', 'dashboard', 'dashboard-cached')
+
+DASHBOARD_OUTPUTS = [
+    ('kpi-indicators', 'children'),
+    ('time-series-chart', 'figure'),
+    ('customer-purchase', 'figure'),
+    ('product-sales', 'figure'),
+    ('sales-rep-performance', 'figure'),
+    ('age-distribution', 'figure'),
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class UploadScenario:
+    """POST a synthetic CSV to /upload through the Flask test client.
+
+    Unless `cached`, the code cache is cleared before every request so each
+    one goes through generation, validation and any retries. With `cached`,
+    the cache is cleared once and warmed with working code from `backend`, so
+    every request measures a hit on the same program whatever ran before.
+    """
+
+    def __init__(self, path, rows, stream=False, cached=False, backend=None):
+        import app
+
+        self.app = app
+        self.client = app.app.test_client()
+        self.path = path
+        self.rows = rows
+        self.stream = stream
+        self.cached = cached
+        if cached:
+            app.code_cache.invalidate()
+            with backend.scripted(['ok']), contextlib.redirect_stdout(io.StringIO()):
+                self.run_once(0)
+
+    def run_once(self, iteration):
+        if not self.cached:
+            self.app.code_cache.invalidate()
+        with open(self.path, 'rb') as f:
+            data = {'file': (f, 'benchmark.csv')}
+            if self.stream:
+                data['stream'] = '1'
+            response = self.client.post('/upload', data=data)
+        try:
+            if response.status_code != 200:
+                raise RuntimeError(f'/upload returned {response.status_code}')
+            # Read the body in pieces so large results are not held in memory
+            return sum(len(chunk) for chunk in response.iter_encoded())
+        finally:
+            response.close()
+
+
+class DashboardScenario:
+    """Call update_dashboard through Dash's HTTP endpoint with varying filter states.
+
+    Each iteration uses a different random filter state (country subset, date
+    range and sometimes a clicked product), so the callback cache always
+    misses; with `cached` every iteration repeats the same state instead.
+    """
+
+    def __init__(self, path, rows, cached=False, seed=0):
+        sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+        os.environ['SALES_DATA_PATH'] = path
+        import reference
+
+        source = reference.load_data()
+        self.dash_app = reference.create_app(source)
+        self.client = self.dash_app.server.test_client()
+        self.rows = rows
+        self.cached = cached
+        self.countries = list(source.df['country'].cat.categories)
+        self.first_day = source.df['purchase_date'].min()
+        self.days = (source.df['purchase_date'].max() - self.first_day).days
+        self.rng = np.random.default_rng(seed)
+        self.state = self._random_state()
+
+    def _random_state(self):
+        countries = ['ALL']
+        if self.rng.random() < 0.5:
+            countries = list(self.rng.choice(self.countries, int(self.rng.integers(1, 6)), replace=False))
+        start = int(self.rng.integers(0, max(self.days - 30, 1)))
+        end = int(self.rng.integers(start + 30, self.days + 31))
+        click = None
+        if self.rng.random() < 0.3:
+            click = {'points': [{'x': str(self.rng.choice(['Product A', 'Product B', 'Product C']))}]}
+        return {
+            'countries': countries,
+            'start': str((self.first_day + np.timedelta64(start, 'D')).date()),
+            'end': str((self.first_day + np.timedelta64(end, 'D')).date()),
+            'product_click': click,
+        }
+
+    def run_once(self, iteration):
+        state = self.state if self.cached else self._random_state()
+        values = [
+            ('dropdown-country', 'value', state['countries']),
+            ('date-picker-range', 'start_date', state['start']),
+            ('date-picker-range', 'end_date', state['end']),
+            ('customer-purchase', 'clickData', None),
+            ('product-sales', 'clickData', state['product_click']),
+            ('sales-rep-performance', 'clickData', None),
+            ('age-distribution', 'selectedData', None),
+            ('reset-button', 'n_clicks', 0),
+            ('data-version', 'data', None),
+        ]
+        changed = 'product-sales.clickData' if state['product_click'] else 'dropdown-country.value'
+        payload = {
+            'output': '..' + '...'.join(f'{id}.{prop}' for id, prop in DASHBOARD_OUTPUTS) + '..',
+            'outputs': [{'id': id, 'property': prop} for id, prop in DASHBOARD_OUTPUTS],
+            'inputs': [{'id': id, 'property': prop, 'value': value} for id, prop, value in values],
+            'changedPropIds': [changed],
+            'state': [],
+        }
+        response = self.client.post('/_dash-update-component', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'Dashboard callback returned {response.status_code}')
+        return len(response.data)
+
+    def extra(self):
+        return {'callback_cache': self.client.get('/cache-stats').get_json()}
+
+
+def measure(scenario, iterations, warmup, verbose=False):
+    from profiling import Profile
+
+    latencies, peaks, growths, sizes = [], [], [], []
+    for iteration in range(warmup + iterations):
+        # The app prints generated code and timings on every request
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        profile = Profile('benchmark', memory='rss', log=False)
+        with output, profile:
+            start = time.perf_counter()
+            size = scenario.run_once(iteration)
+            elapsed = time.perf_counter() - start
+        if iteration < warmup:
+            continue
+        latencies.append(elapsed)
+        sizes.append(size)
+        peaks.append(profile.memory_peak)
+        growths.append(profile.memory_peak - profile.memory_start)
+
+    mean = sum(latencies) / len(latencies)
+    result = {
+        'iterations': iterations,
+        'rows': scenario.rows,
+        'p50_seconds': percentile(latencies, 0.5),
+        'p99_seconds': percentile(latencies, 0.99),
+        'mean_seconds': mean,
+        'rows_per_second': scenario.rows / mean if mean else None,
+        'requests_per_second': 1 / mean if mean else None,
+        'peak_memory_mb': max(peaks) / 2 ** 20,
+        'peak_growth_mb': max(growths) / 2 ** 20,
+        'response_bytes': int(sum(sizes) / len(sizes)),
+    }
+    if hasattr(scenario, 'extra'):
+        result.update(scenario.extra())
+    return result
+
+
+def check_thresholds(results, thresholds):
+    # Thresholds are keyed 'scenario/size' with any of max_p99_seconds, max_peak_memory_mb,
+    # max_peak_growth_mb (peak above the RSS at the start of the iteration) and min_rows_per_second
+    failures = []
+    for key, result in results.items():
+        limits = thresholds.get(key)
+        if not limits:
+            continue
+        if 'max_p99_seconds' in limits and result['p99_seconds'] > limits['max_p99_seconds']:
+            failures.append(f"{key}: p99 {result['p99_seconds']:.3f}s > {limits['max_p99_seconds']}s")
+        if 'max_peak_memory_mb' in limits and result['peak_memory_mb'] > limits['max_peak_memory_mb']:
+            failures.append(f"{key}: peak memory {result['peak_memory_mb']:.0f}MB > {limits['max_peak_memory_mb']}MB")
+        if 'max_peak_growth_mb' in limits and result['peak_growth_mb'] > limits['max_peak_growth_mb']:
+            failures.append(f"{key}: memory growth {result['peak_growth_mb']:.0f}MB > {limits['max_peak_growth_mb']}MB")
+        if 'min_rows_per_second' in limits and result['rows_per_second'] < limits['min_rows_per_second']:
+            failures.append(
+                f"{key}: {result['rows_per_second']:.0f} rows/s < {limits['min_rows_per_second']} rows/s")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the offline benchmarks.')
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=['upload', 'dashboard'])
+    parser.add_argument('--size', nargs='+', default=['10k'], help="10k, 1m, 10m or a row count")
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--llm-script', default='ok,error,no-columns,row-wise,rate-limit',
+                        help="Comma-separated first answers of the stub LLM, cycled per generation: "
+                             "ok, error, no-columns, row-wise, no-code or rate-limit")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Seconds the stub LLM waits per call")
+    parser.add_argument('--sandbox-workers', default='0',
+                        help="SANDBOX_WORKERS for the app; 0 runs generated code in-process")
+    parser.add_argument('--data-dir', default=os.path.join(BENCHMARK_DIR, 'data'))
+    parser.add_argument('--thresholds', default=os.path.join(BENCHMARK_DIR, 'thresholds.json'))
+    parser.add_argument('--check', action='store_true', help="Exit with status 1 if a threshold is exceeded")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--verbose', action='store_true', help="Show the app's own output")
+    args = parser.parse_args(argv)
+
+    # Everything the app writes goes to a scratch directory, and it must be configured before import
+    scratch = tempfile.mkdtemp(prefix='autofe-bench-')
+    os.environ.update({
+        'CODE_CACHE_DIR': os.path.join(scratch, 'code'),
+        'JOB_DIR': os.path.join(scratch, 'jobs'),
+        'DASHBOARD_CACHE_DIR': os.path.join(scratch, 'dashboard'),
+        'DATA_CACHE_DIR': os.path.join(scratch, 'data'),
+        'PIPELINE_DIR': os.path.join(scratch, 'pipelines'),
+        'PROFILE_DIR': os.path.join(scratch, 'profiles'),
+        'SANDBOX_WORKERS': args.sandbox_workers,
+        'LLM_BACKEND': 'stub',
+    })
+    sys.path.insert(0, ROOT_DIR)
+    sys.path.insert(0, BENCHMARK_DIR)
+    import llm
+    import synthetic
+    from stub_llm import ScriptedBackend
+
+    backend = ScriptedBackend(args.llm_script.split(','), latency=args.llm_latency)
+    # No pacing and short backoff, so rate-limit cases cost a retry rather than seconds of sleep
+    llm.set_client(llm.LLMClient(backend, rate=0, base_delay=0.01, max_delay=0.05))
+
+    results = {}
+    for size in args.size:
+        for name in args.scenario:
+            backend.reset()
+            if name.startswith('upload'):
+                path = synthetic.dataset(args.data_dir, 'upload', size, args.seed)
+                rows = synthetic.SIZES.get(size) or int(size)
+                scenario = UploadScenario(path, rows, stream=name == 'upload-stream', cached=name == 'upload-cached',
+                                          backend=backend)
+            else:
+                path = synthetic.dataset(args.data_dir, 'sales', size, args.seed)
+                rows = synthetic.SIZES.get(size) or int(size)
+                scenario = DashboardScenario(path, rows, cached=name == 'dashboard-cached', seed=args.seed)
+            key = f'{name}/{size}'
+            print(f"Running {key} ({args.iterations} iterations)")
+            results[key] = measure(scenario, args.iterations, args.warmup, args.verbose)
+            result = results[key]
+            print(
+                f"  p50 {result['p50_seconds']:.3f}s  p99 {result['p99_seconds']:.3f}s  "
+                f"{result['rows_per_second']:,.0f} rows/s  peak {result['peak_memory_mb']:.0f}MB "
+                f"(+{result['peak_growth_mb']:.0f}MB)  {result['response_bytes']:,} response bytes"
+            )
+
+    results['llm'] = llm.get_client().metrics()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+
+    if args.check:
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+        failures = check_thresholds({key: value for key, value in results.items() if key != 'llm'}, thresholds)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            return 1
+        print("All thresholds met")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Works on any frame: z-scores for numeric columns and a per-row null count
+GOOD_CODE = """```python
+def process_dataframe(df):
+    numeric = df.select_dtypes('number').columns
+    for column in numeric:
+        std = df[column].std()
+        df[f'{column}_zscore'] = (df[column] - df[column].mean()) / (std if std else 1)
+    df['row_missing_count'] = df.isna().sum(axis=1)
+    return df
+
+df = process_dataframe(df)
+```"""
+
+# First answers that fail in different ways, each sending the pipeline down a retry path
+FAILURES = {
+    # Raises KeyError when run
+    'error': """```python
+df['broken'] = df['column_that_does_not_exist'] * 2
+```""",
+    # Runs but adds nothing, so run_generated_code rejects it
+    'no-columns': """```python
+df = df
+```""",
+    # Row-wise apply the vectorizer flags (and, in retry mode, sends back for a rewrite)
+    'row-wise': """```python
+df['first_is_missing'] = df.apply(lambda row: row.iloc[0] is None, axis=1)
+```""",
+    # No code block at all: the upload is returned unchanged
+    'no-code': "I cannot help with that.",
+}
+
+
+class RateLimited(Exception):
+    # Looks like google.api_core's ResourceExhausted to llm.is_rate_limit
+    code = 429
+
+
+class ScriptedBackend:
+    """Deterministic LLM backend for benchmarks.
+
+    First-generation prompts are answered by walking `script`, one entry per
+    prompt: 'ok' gives working code, a key of FAILURES gives that broken
+    answer, and 'rate-limit' raises a 429 once before answering with working
+    code. Fix requests always get working code, so every failure exercises
+    exactly one retry.
+    """
+
+    def __init__(self, script=('ok',), latency=0.0):
+        self.script = list(script)
+        self.latency = latency
+        self._position = 0
+        self._lock = threading.Lock()
+        self._pending_rate_limit = False
+
+    def reset(self):
+        with self._lock:
+            self._position = 0
+            self._pending_rate_limit = False
+
+    @contextmanager
+    def scripted(self, script):
+        # Answer with a different script inside the block, e.g. ['ok'] to warm a cache
+        with self._lock:
+            saved = self.script
+            self.script = list(script)
+            self._position = 0
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self.script = saved
+                self._position = 0
+
+    def generate(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        if 'Previous code:' in prompt:
+            return GOOD_CODE
+        with self._lock:
+            if self._pending_rate_limit:
+                self._pending_rate_limit = False
+                return GOOD_CODE
+            case = self.script[self._position % len(self.script)]
+            self._position += 1
+            if case == 'rate-limit':
+                self._pending_rate_limit = True
+        if case == 'rate-limit':
+            raise RateLimited('Resource has been exhausted (stub)')
+        if case == 'ok':
+            return GOOD_CODE
+        return FAILURES[case]
@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Rows generated and written per step, so 10M-row files never sit in memory at once
+CHUNK_ROWS = 500_000
+
+DEPARTMENTS = ['Sales', 'Engineering', 'Support', 'Finance', 'HR', 'Legal', 'Marketing', 'Operations']
+PRODUCTS = ['Product A', 'Product B', 'Product C']
+
+
+def _with_nulls(rng, values, rate):
+    if rate <= 0:
+        return values
+    values = pd.Series(values)
+    return values.mask(rng.random(len(values)) < rate)
+
+
+def _words(rng, count, length=8):
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    return [''.join(word) for word in letters[rng.integers(0, len(letters), (count, length))]]
+
+
+def upload_chunk(rows, seed, start=0):
+    """Mixed-dtype frame for the /upload scenarios: ints, floats, categories, text, dates and bools
+    at different null rates, plus a mostly-numeric text column with junk values."""
+    rng = np.random.default_rng(seed)
+    cities = _words(rng, 200, 6)
+    rng = np.random.default_rng([seed, start])
+    ratings = rng.integers(1, 6, rows).astype(str).astype(object)
+    ratings[rng.random(rows) < 0.01] = 'n/a'
+    return pd.DataFrame({
+        'id': np.arange(start, start + rows),
+        'age': _with_nulls(rng, rng.integers(18, 70, rows), 0.05),
+        'income': _with_nulls(rng, rng.lognormal(10.5, 0.6, rows).round(2), 0.10),
+        'score': rng.normal(0, 1, rows).round(4),
+        'department': _with_nulls(rng, rng.choice(DEPARTMENTS, rows), 0.02),
+        'city': _with_nulls(rng, rng.choice(cities, rows), 0.05),
+        'name': _with_nulls(rng, _words(rng, rows), 0.01),
+        'joined': _with_nulls(
+            rng, pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 5000, rows), 'D'), 0.03),
+        'active': rng.random(rows) < 0.7,
+        'rating': ratings,
+    })
+
+
+def sales_chunk(rows, seed, start=0):
+    """Frame with the dashboard's sales_data_1.csv schema."""
+    rng = np.random.default_rng(seed)
+    countries = _words(rng, 120, 7)
+    customers = _words(rng, 5000, 10)
+    representatives = _words(rng, 300, 9)
+    rng = np.random.default_rng([seed, start])
+    dates = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, rows), 'D')
+    return pd.DataFrame({
+        'customer_id': np.arange(start, start + rows),
+        'customer_name': rng.choice(customers, rows),
+        'age': rng.integers(18, 85, rows),
+        'email': [f'user{i}@example.com' for i in range(start, start + rows)],
+        'country': rng.choice(countries, rows),
+        'postal_code': _with_nulls(rng, rng.integers(10000, 99999, rows).astype(str), 0.5),
+        'purchase_amount': rng.uniform(10, 10000, rows).round(2),
+        'purchase_date': dates.strftime('%m/%d/%Y'),
+        'product_name': rng.choice(PRODUCTS, rows),
+        'sales_representative': rng.choice(representatives, rows),
+    })
+
+
+GENERATORS = {'upload': upload_chunk, 'sales': sales_chunk}
+
+
+def write_csv(path, kind, rows, seed=0):
+    """Write a synthetic CSV of the given kind in chunks; the same arguments always give the same file."""
+    generate = GENERATORS[kind]
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = generate(min(CHUNK_ROWS, rows - start), seed, start)
+            chunk.to_csv(f, header=start == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def dataset(data_dir, kind, size, seed=0):
+    """Path to the cached synthetic CSV for kind and size ('10k', '1m', '10m' or a row count)."""
+    rows = SIZES.get(size) or int(size)
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'{kind}-{rows}-{seed}.csv')
+    if not os.path.exists(path):
+        print(f"Generating {rows} {kind} rows into {path}")
+        write_csv(path, kind, rows, seed)
+    return path
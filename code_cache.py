@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from file_lru import FileLRU
+
+# Keys are sha256 hex digests; anything else could point the path outside the cache directory
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class CodeCache:
+    """On-disk cache of validated process_dataframe code.
+
+    Entries are keyed by a hash of the DataFrame schema (column names and
+    inferred dtypes) plus the prompt template, so a re-upload of a file with
+    the same shape can reuse code that already worked instead of asking
+    Gemini again. Each entry is a small JSON file whose mtime doubles as its
+    last-used time: entries unused for longer than the TTL expire, and the
+    least recently used entries are dropped once max_entries is exceeded.
+    """
+
+    def __init__(self, directory, max_entries=256, ttl=7 * 24 * 3600):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._files = FileLRU(directory, '.json', max_entries, ttl)
+
+    @staticmethod
+    def key_for(df, prompt_template):
+        schema = [[str(column), str(dtype)] for column, dtype in df.dtypes.items()]
+        payload = json.dumps({'schema': schema, 'prompt': prompt_template}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        if not isinstance(key, str) or not KEY_PATTERN.match(key):
+            raise ValueError(f'Invalid cache key: {key!r}')
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                if self._files.expire(path):
+                    self.evictions += 1
+                    self.misses += 1
+                    return None
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self.misses += 1
+                return None
+
+            self._files.touch(path)
+            self.hits += 1
+            return entry['code']
+
+    def put(self, key, code, columns=None):
+        entry = {'code': code, 'created': time.time(), 'columns': [str(column) for column in (columns if columns is not None else [])]}
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            self.evictions += self._files.evict()
+
+    def invalidate(self, key=None):
+        """Remove one entry, or every entry when no key is given. Returns the count removed."""
+        with self._lock:
+            if key is not None:
+                return 1 if self._files.remove(self._path(key)) else 0
+            removed = 0
+            for path in self._files.entries():
+                removed += self._files.remove(path)
+            return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._files.entries()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'max_entries': self._files.max_entries,
+                'ttl': self._files.ttl,
+            }
+
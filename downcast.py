@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+# Signed integer types tried in order; unsigned ones are avoided since subtraction wraps around
+INTEGER_TYPES = ('int8', 'int16', 'int32', 'int64')
+
+# Values looked at to decide whether a column is text and whether it is worth a category
+SAMPLE_VALUES = 10000
+
+
+def _arrow_string_dtype():
+    # Arrow-backed strings that keep NaN as the missing value, so comparisons behave like object
+    # columns; older pandas spell it differently and pandas without pyarrow has neither
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        pass
+    try:
+        return pd.StringDtype('pyarrow_numpy')
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_text(series):
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return False
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return False
+    sample = series.dropna().head(SAMPLE_VALUES)
+    return len(sample) > 0 and pd.api.types.infer_dtype(sample, skipna=True) == 'string'
+
+
+def _smallest_integer(series):
+    low, high = series.min(), series.max()
+    for name in INTEGER_TYPES:
+        info = np.iinfo(name)
+        if info.min <= low and high <= info.max:
+            return name
+    return None
+
+
+def _optimized(series, max_category_ratio, numbers, arrow_strings):
+    # Returns the converted column, or None when nothing smaller fits without losing information
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return None
+    if pd.api.types.is_numeric_dtype(dtype) and not numbers:
+        return None
+    if isinstance(dtype, np.dtype) and dtype.kind == 'i':
+        if series.isna().all():
+            return None
+        target = _smallest_integer(series)
+        if target is not None and np.dtype(target).itemsize < dtype.itemsize:
+            return series.astype(target)
+        return None
+    if dtype == np.float64:
+        values = series.to_numpy()
+        narrowed = values.astype(np.float32)
+        # Only when every value survives the round trip, so no feature loses precision
+        if np.array_equal(values, narrowed.astype(np.float64), equal_nan=True):
+            return pd.Series(narrowed, index=series.index, name=series.name)
+        return None
+    if _is_text(series):
+        # Check a slice first so high-cardinality columns skip the full distinct count
+        head = series.head(SAMPLE_VALUES)
+        if head.nunique() <= max_category_ratio * len(head):
+            if series.nunique() <= max_category_ratio * len(series):
+                return series.astype('category')
+        if arrow_strings and pd.api.types.is_object_dtype(dtype):
+            string_dtype = _arrow_string_dtype()
+            if string_dtype is not None:
+                return series.astype(string_dtype)
+    return None
+
+
+def optimize_dtypes(df, columns=None, max_category_ratio=0.5, numbers=True, arrow_strings=False):
+    """Shrink the columns of df (all of them, or just `columns`) to smaller dtypes, in place.
+
+    Text columns with at most max_category_ratio distinct values per row become
+    categoricals; with arrow_strings the other object text columns become
+    Arrow-backed strings. With numbers, integers are downcast to the smallest
+    signed type that holds their range, and float64 columns to float32 when
+    every value is exactly representable. Leave numbers off for frames that
+    code will still compute on: arithmetic keeps the narrow type and an int32
+    column times 1000 wraps around silently.
+
+    Returns a report of bytes before and after and each column's conversion.
+    """
+    columns = list(df.columns if columns is None else columns)
+    before = after = 0
+    converted = {}
+    for column in columns:
+        series = df[column]
+        if not isinstance(series, pd.Series):
+            # Duplicate column names; leave them alone
+            continue
+        size = int(series.memory_usage(index=False, deep=True))
+        before += size
+        optimized = _optimized(series, max_category_ratio, numbers, arrow_strings)
+        if optimized is not None:
+            new_size = int(optimized.memory_usage(index=False, deep=True))
+            if new_size < size:
+                df[column] = optimized
+                converted[str(column)] = f'{series.dtype} -> {optimized.dtype}'
+                size = new_size
+        after += size
+    return {
+        'bytes_before': before,
+        'bytes_after': after,
+        'bytes_saved': before - after,
+        'columns': converted,
+    }
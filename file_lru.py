@@ -0,0 +1,68 @@
+import os
+import time
+
+
+class FileLRU:
+    """A directory of cache files whose mtimes double as last-used times.
+
+    Shared by the upload app's code cache and the dashboard's callback cache.
+    Files ending in `suffix` are the entries; callers write them atomically and
+    touch() them on every hit. Entries unused for longer than ttl expire, and
+    evict() drops the least recently used ones beyond max_entries. Locking and
+    hit/miss counting are left to the caller.
+    """
+
+    def __init__(self, directory, suffix, max_entries, ttl):
+        self.directory = directory
+        self.suffix = suffix
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entries(self):
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(self.suffix)
+        ]
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def expire(self, path, now=None):
+        """Remove path if it is older than the TTL; True if it was. Raises FileNotFoundError."""
+        now = time.time() if now is None else now
+        if now - os.path.getmtime(path) > self.ttl:
+            self.remove(path)
+            return True
+        return False
+
+    def touch(self, path):
+        # Counts as recently used
+        os.utime(path, None)
+
+    def evict(self):
+        """Drop expired entries and the oldest ones beyond max_entries; returns the count removed."""
+        now = time.time()
+        live = []
+        evicted = 0
+        for path in self.entries():
+            try:
+                mtime = os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            if now - mtime > self.ttl:
+                evicted += self.remove(path)
+            else:
+                live.append((mtime, path))
+
+        overflow = len(live) - self.max_entries
+        if overflow > 0:
+            live.sort()
+            for _, path in live[:overflow]:
+                evicted += self.remove(path)
+        return evicted
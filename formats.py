@@ -0,0 +1,120 @@
+import io
+import os
+
+import pandas as pd
+
+# name -> (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'feather': ('application/vnd.apache.arrow.file', '.feather'),
+}
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+    '.ipc': 'feather',
+}
+
+# Extra mimetypes clients send for the same formats
+MIMETYPES = {
+    'text/csv': 'csv',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+    'application/vnd.apache.arrow.file': 'feather',
+    'application/x-feather': 'feather',
+}
+
+
+class UnsupportedFormatError(ValueError):
+    pass
+
+
+def format_for_filename(filename):
+    return EXTENSIONS.get(os.path.splitext(filename.lower())[1])
+
+
+def negotiate_output_format(requested, accept, default='csv'):
+    """Pick the output format from an explicit form value, then the Accept header."""
+    if requested:
+        requested = requested.lower()
+        if requested in ('arrow', 'ipc'):
+            requested = 'feather'
+        if requested not in FORMATS:
+            raise UnsupportedFormatError(f'Unsupported output format: {requested}')
+        return requested
+    if accept:
+        match = accept.best_match(list(MIMETYPES))
+        if match:
+            return MIMETYPES[match]
+    return default
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise UnsupportedFormatError('Parquet and Arrow files need the pyarrow package')
+    return pa
+
+
+def read_path(path, fmt):
+    # Columnar inputs are memory-mapped, so the OS pages data in instead of it being read up front
+    if fmt == 'csv':
+        return pd.read_csv(path)
+    pa = _pyarrow()
+    if fmt == 'parquet':
+        table = pa.parquet.read_table(path, memory_map=True)
+    elif fmt == 'feather':
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+    else:
+        raise UnsupportedFormatError(f'Unsupported input format: {fmt}')
+    # split_blocks + self_destruct release Arrow memory column by column during conversion
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _to_table(df):
+    pa = _pyarrow()
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_path(df, path, fmt):
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return
+    pa = _pyarrow()
+    table = _to_table(df)
+    if fmt == 'parquet':
+        pa.parquet.write_table(table, path)
+    elif fmt == 'feather':
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise UnsupportedFormatError(f'Unsupported output format: {fmt}')
+
+
+def write_buffer(df, fmt):
+    """Serialize df into a readable binary file object for a response body."""
+    if fmt == 'csv':
+        output = io.BytesIO()
+        df.to_csv(output, index=False)
+        output.seek(0)
+        return output
+    pa = _pyarrow()
+    table = _to_table(df)
+    sink = pa.BufferOutputStream()
+    if fmt == 'parquet':
+        pa.parquet.write_table(table, sink)
+    elif fmt == 'feather':
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise UnsupportedFormatError(f'Unsupported output format: {fmt}')
+    # Serve the Arrow buffer directly rather than copying it into a BytesIO
+    return pa.BufferReader(sink.getvalue())
@@ -0,0 +1,214 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def _boot_id():
+    # Changes on every reboot, so a pid recorded before one is never mistaken for a live process
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+BOOT_ID = _boot_id()
+
+
+def current_owner():
+    return f'{BOOT_ID}:{os.getpid()}'
+
+
+def owner_alive(owner):
+    """Whether the process that recorded `owner` (see current_owner) is still running."""
+    boot_id, _, pid = (owner or '').rpartition(':')
+    if boot_id != BOOT_ID or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    """SQLite-backed record of feature generation jobs and their result files.
+
+    Jobs (and their files) are purged once they are older than the TTL.
+    """
+
+    def __init__(self, db_path, ttl=24 * 3600):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    input_path TEXT,
+                    result_path TEXT,
+                    download_name TEXT,
+                    mimetype TEXT,
+                    error TEXT,
+                    report TEXT,
+                    owner TEXT
+                )
+                """
+            )
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(jobs)')]
+            if 'report' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN report TEXT')
+            if 'owner' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id, input_path):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, created, updated, input_path, owner) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', now, now, input_path, current_owner()),
+            )
+
+    def update(self, job_id, **fields):
+        fields['updated'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._lock, self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if time.time() - job['created'] > self.ttl:
+            self.purge_expired()
+            return None
+        job['report'] = json.loads(job['report']) if job['report'] else {}
+        return job
+
+    def count_pending(self):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def fail_interrupted(self):
+        """Mark jobs left queued or running by a process that is gone as failed and delete their files.
+
+        Jobs owned by other live processes sharing the database (e.g. other
+        gunicorn workers) are left alone.
+        """
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, input_path, result_path, owner FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+            rows = [row[:3] for row in rows if not owner_alive(row[3])]
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?",
+                [('interrupted by restart', time.time(), row[0]) for row in rows],
+            )
+        for _, input_path, result_path in rows:
+            for path in (input_path, result_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+        return len(rows)
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                'SELECT id, input_path, result_path FROM jobs WHERE created < ?',
+                (cutoff,),
+            ).fetchall()
+            conn.executemany('DELETE FROM jobs WHERE id = ?', [(row[0],) for row in rows])
+        for _, input_path, result_path in rows:
+            for path in (input_path, result_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+        return len(rows)
+
+
+class JobQueue:
+    """Runs feature generation jobs on a bounded thread pool.
+
+    `handler(input_path, output_path, options, report)` does the work, may fill the
+    `report` dict with details for the status endpoint, and returns the result's
+    (download_name, mimetype); it is run outside any request context.
+    """
+
+    def __init__(self, store, handler, work_dir, max_workers=2, max_pending=16):
+        self.store = store
+        self.handler = handler
+        self.work_dir = os.path.abspath(work_dir)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='feature-job')
+        os.makedirs(self.work_dir, exist_ok=True)
+        # Jobs from a crashed or restarted process will never finish; don't let them fill the queue
+        interrupted = self.store.fail_interrupted()
+        if interrupted:
+            print(f"Marked {interrupted} interrupted jobs as failed")
+
+    def submit(self, save_input, options=None):
+        """Create a job; `save_input(path)` writes the uploaded file to the given path."""
+        self.store.purge_expired()
+        if self.store.count_pending() >= self.max_pending:
+            raise QueueFullError('Too many jobs are waiting, try again later')
+
+        job_id = uuid.uuid4().hex
+        input_path = os.path.join(self.work_dir, f'{job_id}.input')
+        save_input(input_path)
+        self.store.create(job_id, input_path)
+        self._executor.submit(self._run, job_id, input_path, dict(options or {}))
+        return job_id
+
+    def _run(self, job_id, input_path, options):
+        self.store.update(job_id, status='running')
+        output_path = os.path.join(self.work_dir, f'{job_id}.result')
+        report = {}
+        try:
+            download_name, mimetype = self.handler(input_path, output_path, options, report)
+        except Exception as e:
+            traceback.print_exc()
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            self.store.update(job_id, status='failed', error=str(e), report=json.dumps(report, default=str))
+        else:
+            self.store.update(
+                job_id,
+                status='done',
+                result_path=output_path,
+                download_name=download_name,
+                mimetype=mimetype,
+                report=json.dumps(report, default=str),
+            )
+        finally:
+            if os.path.exists(input_path):
+                os.remove(input_path)
@@ -0,0 +1,207 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from profiling import span
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class GeminiBackend:
+    """Gemini through google-generativeai, configured once per process.
+
+    The GenerativeModel (and the gRPC channel under it) is reused for every
+    call, so concurrent requests share pooled connections instead of each
+    setting up their own client.
+    """
+
+    def __init__(self, model_name, api_key):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        return response.text
+
+
+STUB_CODE = """```python
+def process_dataframe(df):
+    # Flag missing values and count them per row
+    for column in list(df.columns):
+        df[f'{column}_is_missing'] = df[column].isna()
+    df['row_missing_count'] = df.isna().sum(axis=1)
+    return df
+
+df = process_dataframe(df)
+```"""
+
+
+class StubBackend:
+    """Offline backend that answers every prompt with canned code after a fixed delay.
+
+    Used for load tests and running the app without an API key.
+    """
+
+    def __init__(self, latency=0.0, response=STUB_CODE):
+        self.latency = latency
+        self.response = response
+
+    def generate(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.response
+
+
+def is_rate_limit(error):
+    # google.api_core raises ResourceExhausted (HTTP 429) when the quota is used up
+    return getattr(error, 'code', None) == 429 or type(error).__name__ in ('ResourceExhausted', 'TooManyRequests')
+
+
+def is_retryable(error):
+    # Rate limits plus transient server-side failures
+    if is_rate_limit(error) or getattr(error, 'code', None) in (500, 503, 504):
+        return True
+    return type(error).__name__ in ('ServiceUnavailable', 'DeadlineExceeded', 'InternalServerError')
+
+
+class LLMClient:
+    """Process-wide entry point for LLM calls.
+
+    Bounds concurrent calls with a semaphore, paces them with a token bucket,
+    retries rate-limit and transient errors with jittered exponential backoff,
+    and records per-call latency.
+    """
+
+    def __init__(self, backend, max_concurrency=4, rate=1.0, burst=4, max_retries=5,
+                 base_delay=1.0, max_delay=30.0, latency_window=1000):
+        self.backend = backend
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._counters = {'calls': 0, 'errors': 0, 'retries': 0, 'rate_limited': 0}
+        self._latency_total = 0.0
+
+    def generate(self, prompt):
+        attempt = 0
+        while True:
+            if self._bucket is not None:
+                self._bucket.acquire()
+            start = time.perf_counter()
+            try:
+                # One span per attempt, so retries show up as separate LLM round trips
+                with self._semaphore, span('llm_attempt'):
+                    text = self.backend.generate(prompt)
+            except Exception as e:
+                self._record(time.perf_counter() - start, error=True, rate_limited=is_rate_limit(e))
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                # Full jitter: sleep a random time up to the exponential ceiling
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                attempt += 1
+                with self._lock:
+                    self._counters['retries'] += 1
+                time.sleep(delay)
+                continue
+            self._record(time.perf_counter() - start)
+            return text
+
+    def _record(self, seconds, error=False, rate_limited=False):
+        with self._lock:
+            self._counters['calls'] += 1
+            self._counters['errors'] += error
+            self._counters['rate_limited'] += rate_limited
+            self._latencies.append(seconds)
+            self._latency_total += seconds
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            metrics = dict(self._counters)
+            metrics['backend'] = type(self.backend).__name__
+            metrics['latency_seconds_total'] = self._latency_total
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+        metrics['latency_seconds'] = {
+            'p50': percentile(0.5),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': latencies[-1] if latencies else None,
+            'window': len(latencies),
+        }
+        return metrics
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def create_backend():
+    # LLM_BACKEND=stub swaps in the offline backend, e.g. for load tests, and
+    # LLM_BACKEND=package.module:Class loads any class with a generate(prompt) method
+    name = os.getenv('LLM_BACKEND', 'gemini')
+    if name == 'stub':
+        return StubBackend(latency=float(os.getenv('LLM_STUB_LATENCY', '0')))
+    if ':' in name:
+        import importlib
+
+        module_name, class_name = name.split(':', 1)
+        return getattr(importlib.import_module(module_name), class_name)()
+    return GeminiBackend(os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'), os.getenv('GEMINI_API_KEY'))
+
+
+def get_client():
+    """Return the process-wide LLMClient, creating it from the environment on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(
+                create_backend(),
+                max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '4')),
+                rate=float(os.getenv('LLM_RATE_PER_SECOND', '1')),
+                burst=int(os.getenv('LLM_BURST', '4')),
+                max_retries=int(os.getenv('LLM_MAX_RETRIES', '5')),
+                base_delay=float(os.getenv('LLM_BACKOFF_BASE', '1')),
+                max_delay=float(os.getenv('LLM_BACKOFF_MAX', '30')),
+            )
+        return _client
+
+
+def set_client(client):
+    """Replace the process-wide client (e.g. with a stub backend in benchmarks)."""
+    global _client
+    with _client_lock:
+        _client = client
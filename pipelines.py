@@ -0,0 +1,286 @@
+"""Saved feature pipelines: generated code that was accepted once, replayed without the LLM.
+
+Command line use:
+
+    python pipelines.py list
+    python pipelines.py apply NAME INPUT [INPUT ...] --output-dir DIR [--version N] [--workers N]
+
+INPUT may be a file or a directory; every CSV, Parquet and Feather file in a
+directory is processed, in parallel across worker processes.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from downcast import optimize_dtypes
+from formats import FORMATS, format_for_filename, read_path, write_path
+from sandbox import run_code
+
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+
+class PipelineError(ValueError):
+    pass
+
+
+class PipelineNotFound(PipelineError):
+    pass
+
+
+class SchemaMismatchError(PipelineError):
+    pass
+
+
+def validate_name(name):
+    if not NAME_PATTERN.match(name or ''):
+        raise PipelineError(f'Invalid pipeline name: {name!r} (use letters, digits, ".", "_" and "-")')
+    return name
+
+
+def schema_of(df):
+    return [[str(column), str(dtype)] for column, dtype in df.dtypes.items()]
+
+
+def schema_hash(schema):
+    # Same idea as CodeCache.key_for, without the prompt: column names and dtypes only
+    return hashlib.sha256(json.dumps(schema).encode('utf-8')).hexdigest()
+
+
+class PipelineStore:
+    """Versioned pipeline artifacts on disk, one JSON file per version.
+
+    `<directory>/<name>/<version>.json` holds the code, the input schema and its
+    hash, the dtypes of every output column and the dtype optimization settings
+    in force when it was saved. Saving under an existing name adds a new
+    version; older versions stay available.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _pipeline_dir(self, name):
+        return os.path.join(self.directory, validate_name(name))
+
+    def versions(self, name):
+        try:
+            files = os.listdir(self._pipeline_dir(name))
+        except FileNotFoundError:
+            return []
+        return sorted(int(file[:-5]) for file in files if file.endswith('.json') and file[:-5].isdigit())
+
+    def save(self, name, code, input_df, output_df, source=None, optimize=None):
+        """Store accepted code with the schema it was validated on; returns the new artifact."""
+        pipeline_dir = self._pipeline_dir(name)
+        input_schema = schema_of(input_df)
+        with self._lock:
+            os.makedirs(pipeline_dir, exist_ok=True)
+            version = (self.versions(name) or [0])[-1] + 1
+            artifact = {
+                'name': name,
+                'version': version,
+                'created': time.time(),
+                'source': source,
+                'code': code,
+                'input_schema': input_schema,
+                'schema_hash': schema_hash(input_schema),
+                'output_dtypes': schema_of(output_df),
+                'optimize': optimize,
+            }
+            path = os.path.join(pipeline_dir, f'{version}.json')
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(artifact, f, indent=2)
+            os.replace(tmp_path, path)
+        return artifact
+
+    def get(self, name, version=None):
+        versions = self.versions(name)
+        if version is None and versions:
+            version = versions[-1]
+        if version is None or int(version) not in versions:
+            raise PipelineNotFound(f'Unknown pipeline {name}' + (f' version {version}' if version else ''))
+        with open(os.path.join(self._pipeline_dir(name), f'{int(version)}.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def list(self):
+        pipelines = []
+        for name in sorted(os.listdir(self.directory)):
+            if NAME_PATTERN.match(name) and os.path.isdir(os.path.join(self.directory, name)):
+                versions = self.versions(name)
+                if versions:
+                    pipelines.append({'name': name, 'versions': versions, 'latest': versions[-1]})
+        return pipelines
+
+
+def check_schema(artifact, df):
+    """Fail if df lacks input columns the pipeline was built on; return warnings for dtype changes."""
+    expected = dict(artifact['input_schema'])
+    actual = {str(column): str(dtype) for column, dtype in df.dtypes.items()}
+    missing = [column for column in expected if column not in actual]
+    if missing:
+        raise SchemaMismatchError(f"Input is missing columns the pipeline needs: {', '.join(missing)}")
+    return [
+        f'{column}: expected {dtype}, got {actual[column]}'
+        for column, dtype in expected.items() if actual[column] != dtype
+    ]
+
+
+def enforce_output_dtypes(artifact, df):
+    """Cast output columns back to the dtypes recorded when the pipeline was saved.
+
+    Keeps features consistent between runs (e.g. an all-null column in a new
+    file coming out as object instead of float64). Returns the frame and any
+    columns that could not be cast.
+    """
+    failed = []
+    for column, dtype in artifact['output_dtypes']:
+        if column in df.columns and str(df[column].dtype) != dtype:
+            try:
+                # astype wraps integers that do not fit instead of raising
+                if np.dtype(dtype).kind == 'i' and df[column].notna().any():
+                    info = np.iinfo(dtype)
+                    if df[column].min() < info.min or df[column].max() > info.max:
+                        raise ValueError(f'{column} does not fit in {dtype}')
+            except TypeError:
+                pass
+            except ValueError:
+                failed.append(column)
+                continue
+            try:
+                df[column] = df[column].astype(dtype)
+            except (TypeError, ValueError):
+                failed.append(column)
+    return df, failed
+
+
+def apply_pipeline(artifact, df, runner=None):
+    """Run a saved pipeline on df. runner(code, df) defaults to running the code in-process.
+
+    The dtype optimization recorded with the pipeline is repeated on both sides of
+    the code, so the web endpoint and the command line give the same result.
+    df's text columns may be converted in place.
+    """
+    settings = artifact.get('optimize') or {}
+    options = {
+        'max_category_ratio': settings.get('max_category_ratio', 0.5),
+        'arrow_strings': settings.get('arrow_strings', False),
+    }
+    if settings.get('input'):
+        optimize_dtypes(df, numbers=False, **options)
+    warnings = check_schema(artifact, df)
+    if runner is None:
+        processed_df, _ = run_code(artifact['code'], df.copy())
+    else:
+        processed_df, _ = runner(artifact['code'], df)
+    if settings.get('output'):
+        added = [column for column in processed_df.columns if column not in df.columns]
+        optimize_dtypes(processed_df, added, **options)
+    processed_df, failed = enforce_output_dtypes(artifact, processed_df)
+    warnings += [f'{column}: could not cast to the saved dtype' for column in failed]
+    return processed_df, warnings
+
+
+def output_path_for(input_path, output_dir, output_format=None):
+    fmt = output_format or format_for_filename(input_path)
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir, f'{name}{FORMATS[fmt][1]}'), fmt
+
+
+def apply_to_file(artifact, input_path, output_path, output_format):
+    # Worker process entry point: read, transform and write one file
+    start = time.perf_counter()
+    df = read_path(input_path, format_for_filename(input_path))
+    processed_df, warnings = apply_pipeline(artifact, df)
+    write_path(processed_df, output_path, output_format)
+    return {
+        'input': input_path,
+        'output': output_path,
+        'rows': len(processed_df),
+        'seconds': time.perf_counter() - start,
+        'warnings': warnings,
+    }
+
+
+def expand_inputs(inputs):
+    # Directories contribute every supported file directly inside them
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths += sorted(
+                os.path.join(path, file) for file in os.listdir(path)
+                if format_for_filename(file) is not None and os.path.isfile(os.path.join(path, file))
+            )
+        else:
+            paths.append(path)
+    return paths
+
+
+def apply_to_files(artifact, inputs, output_dir, output_format=None, workers=None):
+    """Apply a pipeline to many files in parallel worker processes; one result dict per file."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = expand_inputs(inputs)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {}
+        for path in paths:
+            output_path, fmt = output_path_for(path, output_dir, output_format)
+            futures[executor.submit(apply_to_file, artifact, path, output_path, fmt)] = path
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({'input': futures[future], 'error': f'{type(e).__name__}: {e}'})
+    return sorted(results, key=lambda result: result['input'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='List or apply saved feature pipelines.')
+    parser.add_argument('--pipeline-dir', default=os.getenv('PIPELINE_DIR', 'pipelines'))
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='Show saved pipelines and their versions')
+    apply = commands.add_parser('apply', help='Apply a pipeline to files or directories of files')
+    apply.add_argument('name')
+    apply.add_argument('inputs', nargs='+')
+    apply.add_argument('--output-dir', required=True)
+    apply.add_argument('--version', type=int)
+    apply.add_argument('--format', choices=sorted(FORMATS), help='Output format (default: same as each input)')
+    apply.add_argument('--workers', type=int, help='Worker processes (default: one per core)')
+    args = parser.parse_args(argv)
+
+    store = PipelineStore(args.pipeline_dir)
+    if args.command == 'list':
+        for pipeline in store.list():
+            print(f"{pipeline['name']}: versions {', '.join(map(str, pipeline['versions']))}")
+        return 0
+
+    try:
+        artifact = store.get(args.name, args.version)
+    except PipelineError as e:
+        print(e, file=sys.stderr)
+        return 1
+    results = apply_to_files(artifact, args.inputs, args.output_dir, args.format, args.workers)
+    failed = 0
+    for result in results:
+        if 'error' in result:
+            failed += 1
+            print(f"{result['input']}: failed, {result['error']}")
+            continue
+        print(f"{result['input']} -> {result['output']}: {result['rows']} rows in {result['seconds']:.2f}s")
+        for warning in result['warnings']:
+            print(f"  warning: {warning}")
+    print(f"Applied {artifact['name']} v{artifact['version']} to {len(results) - failed} of {len(results)} files")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+import contextvars
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Profile of the request or job running in the current context, if any
+_current = contextvars.ContextVar('profile', default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# 1 MiB to 16 GiB in powers of two
+MEMORY_BUCKETS = tuple(float(2 ** power * 1024 * 1024) for power in range(15))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def format_metric(name, kind, help, value, labels=()):
+    """Prometheus text lines for a single unlabelled (or fixed-label) counter or gauge."""
+    return [f'# HELP {name} {help}', f'# TYPE {name} {kind}', f'{name}{_labels(list(labels))} {value}']
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(list(zip(self.labelnames, key)))} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # label values -> [per-bucket counts, sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                pairs = list(zip(self.labelnames, key))
+                # Bucket counts are cumulative already: each observation lands in every bucket above it
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{_labels(pairs + [("le", bound)])} {bucket_count}')
+                lines.append(f'{self.name}_bucket{_labels(pairs + [("le", "+Inf")])} {count}')
+                lines.append(f'{self.name}_sum{_labels(pairs)} {total}')
+                lines.append(f'{self.name}_count{_labels(pairs)} {count}')
+        return lines
+
+
+requests_total = Counter('autofe_requests_total', 'Profiled requests and jobs', ('name', 'status'))
+request_seconds = Histogram('autofe_request_duration_seconds', 'Wall time of a request or job', ('name',))
+stage_seconds = Histogram('autofe_stage_duration_seconds', 'Wall time of one pipeline stage', ('stage',))
+memory_saved_bytes = Counter(
+    'autofe_memory_saved_bytes_total', 'Bytes saved by dtype optimization', ('stage',))
+peak_memory_bytes = Histogram(
+    'autofe_request_peak_memory_bytes', 'Peak memory seen while a request or job ran', ('name',),
+    buckets=MEMORY_BUCKETS,
+)
+
+
+def render_metrics():
+    lines = []
+    for metric in (requests_total, request_seconds, stage_seconds, peak_memory_bytes, memory_saved_bytes):
+        lines.extend(metric.render())
+    return lines
+
+
+def _read_rss():
+    # Resident set size from /proc on Linux; elsewhere fall back to the process's lifetime peak
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _RssSampler:
+    """One background thread that samples RSS while at least one profile is active.
+
+    Memory is per process, so concurrent requests all see the same samples.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._profiles = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, profile):
+        rss = _read_rss()
+        with self._lock:
+            profile.memory_start = profile.memory_peak = rss
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+                self._thread.start()
+
+    def remove(self, profile):
+        rss = _read_rss()
+        with self._lock:
+            profile.memory_peak = max(profile.memory_peak, rss)
+            self._profiles.discard(profile)
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            rss = _read_rss()
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                for profile in self._profiles:
+                    profile.memory_peak = max(profile.memory_peak, rss)
+
+
+_rss_sampler = _RssSampler()
+_cprofile_lock = threading.Lock()
+
+
+class Profile:
+    """Timing spans, peak memory and an optional cProfile capture for one request or job.
+
+    Used as a context manager; while active, span() calls anywhere in the same
+    context (including threads started with a copied context) record into it.
+    memory is 'rss' (sampled resident set size), 'tracemalloc' (peak Python
+    allocations, process-wide, so overlapping requests share a peak) or 'off'.
+    On exit the summary is recorded in the Prometheus metrics and logged as JSON.
+    """
+
+    def __init__(self, name, memory='rss', cprofile=False, cprofile_dir=None, log=True):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.memory = memory
+        self.cprofile = cprofile
+        self.cprofile_dir = cprofile_dir
+        self.log = log
+        self.status = 'ok'
+        self.spans = []
+        self.summary = None
+        self.memory_start = self.memory_peak = None
+        self._profiler = None
+        self._token = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.memory == 'rss':
+            _rss_sampler.add(self)
+        elif self.memory == 'tracemalloc':
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        # Only one cProfile capture can run at a time; others are skipped rather than queued
+        if self.cprofile and _cprofile_lock.acquire(blocking=False):
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Exited from a different context (e.g. the end of a streamed response)
+            _current.set(None)
+        if exc_type is not None:
+            self.status = 'error'
+
+        captured = self._profiler is not None
+        if captured:
+            self._profiler.disable()
+            _cprofile_lock.release()
+            profile_path, top_functions = self._save_cprofile()
+
+        if self.memory == 'rss':
+            _rss_sampler.remove(self)
+        elif self.memory == 'tracemalloc':
+            import tracemalloc
+
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+
+        stages = {}
+        for name, _, duration in self.spans:
+            stage = stages.setdefault(name, {'count': 0, 'seconds': 0.0})
+            stage['count'] += 1
+            stage['seconds'] += duration
+            stage_seconds.observe(duration, stage=name)
+
+        self.summary = {
+            'event': 'profile',
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'seconds': round(seconds, 6),
+            'stages': {name: {'count': s['count'], 'seconds': round(s['seconds'], 6)} for name, s in stages.items()},
+            'memory_mode': self.memory,
+        }
+        if self.memory_peak is not None:
+            self.summary['peak_memory_bytes'] = self.memory_peak
+            self.summary['memory_growth_bytes'] = self.memory_peak - self.memory_start
+            peak_memory_bytes.observe(self.memory_peak, name=self.name)
+        if captured:
+            self.summary['cprofile'] = {'path': profile_path, 'top': top_functions}
+
+        requests_total.inc(name=self.name, status=self.status)
+        request_seconds.observe(seconds, name=self.name)
+        if self.log:
+            print(json.dumps(self.summary, default=str), flush=True)
+        return False
+
+    @contextmanager
+    def bind(self):
+        """Make this the current profile while the block runs, e.g. in a response generator."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def _save_cprofile(self, limit=15):
+        import pstats
+
+        output = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(limit)
+        path = None
+        if self.cprofile_dir:
+            os.makedirs(self.cprofile_dir, exist_ok=True)
+            path = os.path.join(self.cprofile_dir, f'{self.id}.prof')
+            stats.dump_stats(path)
+        # Keep just the table rows of the report
+        rows = [line.strip() for line in output.getvalue().splitlines() if line.strip()]
+        start = next((i for i, line in enumerate(rows) if line.startswith('ncalls')), len(rows))
+        return path, rows[start:]
+
+
+def current_profile():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Time a stage of the current profile; a no-op outside of one."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.spans.append((name, start - profile._start, time.perf_counter() - start))
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+
+def validation_sample(df, size, rows_per_case=5, scan_rows=200000, random_state=0):
+    """Pick a small sample of df that still contains the awkward rows.
+
+    For every column the sample includes a few rows with nulls and, where they
+    exist, rows that break the column's apparent type (non-numeric strings in a
+    mostly numeric column, empty strings, zeros and extremes in numeric
+    columns). The rest of the sample is filled with uniformly random rows.
+    Odd-value detection looks at a random subset of `scan_rows` rows so its
+    cost does not grow with the file.
+    """
+    if len(df) <= size:
+        return df
+
+    rng = np.random.default_rng(random_state)
+    positions = set()
+
+    def take(mask, limit=rows_per_case, rows=None):
+        # mask covers either every row of df or, when rows is given, just those positions
+        hits = np.flatnonzero(mask)
+        if len(hits) > limit:
+            hits = rng.choice(hits, limit, replace=False)
+        if rows is not None:
+            hits = rows[hits]
+        positions.update(int(position) for position in hits)
+
+    scan = np.sort(rng.choice(len(df), min(scan_rows, len(df)), replace=False))
+    for column in df.columns:
+        series = df[column]
+        take(series.isna().to_numpy())
+
+        values = series.iloc[scan]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            numbers = values.to_numpy(dtype='float64', na_value=np.nan)
+            if np.isfinite(numbers).any():
+                take(numbers == 0, rows=scan)
+                take(numbers == np.nanmin(numbers), limit=1, rows=scan)
+                take(numbers == np.nanmax(numbers), limit=1, rows=scan)
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            present = values.notna().to_numpy()
+            text = values.astype(str).str.strip()
+            take(present & (text == '').to_numpy(), rows=scan)
+            numeric = pd.to_numeric(values, errors='coerce').notna().to_numpy()
+            if present.any() and numeric[present].mean() > 0.5:
+                # Mostly numbers: keep the values that would break a numeric conversion
+                take(present & ~numeric, rows=scan)
+            if pd.api.types.is_object_dtype(values):
+                # Mixed Python types in one column (e.g. ints and strs)
+                kinds = values[present].map(type)
+                if kinds.nunique() > 1:
+                    rare = kinds != kinds.mode().iloc[0]
+                    mask = np.zeros(len(values), dtype=bool)
+                    mask[np.flatnonzero(present)[rare.to_numpy()]] = True
+                    take(mask, rows=scan)
+
+    remaining = size - len(positions)
+    if remaining > 0:
+        candidates = rng.choice(len(df), min(len(df), size * 2), replace=False)
+        for position in candidates:
+            if remaining <= 0:
+                break
+            if int(position) not in positions:
+                positions.add(int(position))
+                remaining -= 1
+
+    return df.iloc[sorted(positions)]
+
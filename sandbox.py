@@ -0,0 +1,234 @@
+import builtins
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+
+from vectorize import CLOCK_NAME, TIMINGS_NAME
+
+
+class SandboxError(Exception):
+    pass
+
+
+class SandboxTimeout(SandboxError):
+    pass
+
+
+def _decode_categories(df):
+    # Categorical text (from dtype optimization or a Parquet/Feather upload) breaks ordinary
+    # string code such as df['a'] + ' ' + df['b'] or fillna('Unknown'), so the code gets plain
+    # text columns. Returns the decoded columns and their dtypes.
+    import pandas as pd
+
+    decoded = {}
+    for column, dtype in list(df.dtypes.items()):
+        if isinstance(dtype, pd.CategoricalDtype) and isinstance(df[column], pd.Series):
+            df[column] = df[column].astype(dtype.categories.dtype)
+            decoded[column] = df[column].dtype
+    return decoded
+
+
+def _encode_categories(df, decoded):
+    # Columns still holding the decoded plain text go back to categoricals, including any
+    # values the code added, so the frame handed back stays small
+    for column, dtype in decoded.items():
+        if column in df.columns and getattr(df[column], 'dtype', None) == dtype:
+            df[column] = df[column].astype('category')
+
+
+def run_code(code, df):
+    # Generated code sees pandas, numpy and the DataFrame as `df`, all in one namespace
+    # so helper functions it defines are visible to each other.
+    # Returns the resulting DataFrame and the per-column timings recorded by instrumented code.
+    import numpy as np
+    import pandas as pd
+
+    decoded = _decode_categories(df)
+    namespace = {
+        '__builtins__': builtins,
+        'pd': pd,
+        'np': np,
+        'df': df,
+        TIMINGS_NAME: [],
+        CLOCK_NAME: time.perf_counter,
+    }
+    exec(code, namespace)
+    if isinstance(namespace['df'], pd.DataFrame):
+        _encode_categories(namespace['df'], decoded)
+    return namespace['df'], namespace[TIMINGS_NAME]
+
+
+def _send(conn, obj):
+    # Pickle protocol 5 hands large numpy buffers over out-of-band, so the column data
+    # goes through the pipe as-is instead of being copied into one big pickle first
+    buffers = []
+    header = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    buffers = [buffer.raw() for buffer in buffers]
+    conn.send([buffer.nbytes for buffer in buffers])
+    conn.send_bytes(header)
+    for buffer in buffers:
+        conn.send_bytes(buffer)
+
+
+def _recv(conn):
+    # Buffers are received into bytearrays: arrays built on immutable bytes would be read-only,
+    # and generated code that assigns into the frame (df.loc[...] = ..., fillna(inplace=True)) would fail
+    sizes = conn.recv()
+    header = conn.recv_bytes()
+    buffers = []
+    for size in sizes:
+        buffer = bytearray(size)
+        if size:
+            conn.recv_bytes_into(buffer)
+        else:
+            conn.recv_bytes()
+        buffers.append(buffer)
+    return pickle.loads(header, buffers=buffers)
+
+
+def _worker_main(conn, memory_limit):
+    # Import pandas before the memory cap so the limit only has to cover the job itself
+    import pandas  # noqa: F401
+
+    if memory_limit:
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ImportError, ValueError, OSError) as e:
+            print(f"Sandbox worker could not set a memory limit: {str(e)}")
+
+    while True:
+        try:
+            code, df = _recv(conn)
+        except (EOFError, OSError):
+            break
+        try:
+            result = ('ok', run_code(code, df))
+        except MemoryError:
+            result = ('error', 'MemoryError: generated code exceeded the sandbox memory limit')
+        except BaseException as e:
+            result = ('error', f'{type(e).__name__}: {str(e)}')
+        del df
+        try:
+            _send(conn, result)
+        except MemoryError:
+            _send(conn, ('error', 'MemoryError: result exceeded the sandbox memory limit'))
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+    def kill(self):
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+
+
+class SandboxPool:
+    """Pre-warmed worker processes that run generated code away from the web process.
+
+    Each job gets a wall-clock timeout and each worker an RLIMIT_AS memory cap.
+    A worker that times out or dies is killed and replaced, so a runaway
+    `apply` or loop only costs that one job. Workers start on first use.
+    """
+
+    def __init__(self, size, timeout=60, memory_limit=None):
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        # forkserver avoids forking the threaded web process; spawn is the portable fallback
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context('forkserver')
+            # Import pandas once in the fork server so new workers start already warm
+            self._context.set_forkserver_preload(['sandbox', 'numpy', 'pandas'])
+        else:
+            self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._workers = []
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.memory_limit),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _replace(self, worker, background=True):
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+        def respawn():
+            self._idle.put(self._spawn())
+
+        if background:
+            threading.Thread(target=respawn, daemon=True).start()
+        else:
+            respawn()
+
+    def _acquire(self):
+        worker = self._idle.get()
+        while not worker.process.is_alive():
+            # Died while idle (e.g. killed by the OS), replace it before use
+            self._replace(worker, background=False)
+            worker = self._idle.get()
+        return worker
+
+    def run(self, code, df, timeout=None):
+        """Run `code` against a copy of `df` in a worker; returns the same as run_code."""
+        self._start()
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._acquire()
+        healthy = False
+        try:
+            _send(worker.conn, (code, df))
+            if not worker.conn.poll(timeout):
+                raise SandboxTimeout(f'Generated code did not finish within {timeout} seconds')
+            status, payload = _recv(worker.conn)
+            healthy = True
+        except (EOFError, OSError):
+            worker.process.join(1)
+            raise SandboxError(
+                f'Sandbox worker exited while running generated code (exit code {worker.process.exitcode})'
+            )
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                self._replace(worker)
+
+        if status == 'error':
+            raise SandboxError(payload)
+        return payload
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.kill()
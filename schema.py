@@ -0,0 +1,89 @@
+import pandas as pd
+
+# Text that pd.to_numeric would accept: ints, decimals and exponents, with optional sign and padding
+NUMERIC_TEXT = r'\s*[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\s*'
+
+# Non-null values per text column checked for numeric text
+TEXT_CHECK_VALUES = 1000
+
+
+def _short(value, width=24):
+    if isinstance(value, pd.Timestamp) and value == value.normalize():
+        value = value.date()
+    text = str(value)
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+def profile_columns(df, sample_rows=None, random_state=0):
+    """Summarize every column of df: dtype, null rate, distinct values and min/max.
+
+    Each statistic is computed for all columns at once with the frame-level
+    pandas reductions rather than column by column. With sample_rows, frames
+    longer than that are profiled on a random sample, which bounds the cost of
+    the distinct counts and text checks on large uploads.
+    Text columns also get the share of values that parse as numbers, so code
+    generation knows which ones actually need converting.
+    """
+    if sample_rows and len(df) > sample_rows:
+        df = df.sample(sample_rows, random_state=random_state)
+
+    null_rates = df.isna().mean()
+    distinct = df.nunique(dropna=True)
+
+    # Min/max only for types where ordering means something
+    ordered = df.select_dtypes(include=['number', 'datetime', 'datetimetz', 'timedelta'])
+    ordered = ordered.select_dtypes(exclude=['bool'])
+    minimums = ordered.min() if len(ordered.columns) else pd.Series(dtype=object)
+    maximums = ordered.max() if len(ordered.columns) else pd.Series(dtype=object)
+
+    text_columns = [
+        column for column in df.columns
+        if pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column])
+    ]
+
+    profiles = []
+    for column in df.columns:
+        profile = {
+            'name': str(column),
+            'dtype': str(df[column].dtype),
+            'null_rate': float(null_rates[column]),
+            'distinct': int(distinct[column]),
+            'rows': len(df),
+        }
+        if column in minimums.index and pd.notna(minimums[column]):
+            profile['min'] = minimums[column]
+            profile['max'] = maximums[column]
+        if column in text_columns:
+            # A regex over a slice is much cheaper than to_numeric, which raises per bad value
+            values = df[column].dropna().head(TEXT_CHECK_VALUES).astype(str)
+            if len(values):
+                profile['numeric_text'] = float(values.str.fullmatch(NUMERIC_TEXT).mean())
+        profiles.append(profile)
+    return profiles
+
+
+def format_schema(profiles):
+    """One compact line per column, e.g. `age: int64, 5% null, 52 distinct, 18..69`."""
+    lines = []
+    for profile in profiles:
+        parts = [profile['dtype']]
+        if profile['null_rate'] > 0:
+            parts.append(f"{profile['null_rate']:.0%} null" if profile['null_rate'] >= 0.01 else '<1% null')
+        present = round(profile['rows'] * (1 - profile['null_rate']))
+        if profile['distinct'] == present and present > 1:
+            # Distinct counts come from the sample, so an ID column shows as unique rather than as the sample size
+            parts.append('unique')
+        else:
+            parts.append(f"{profile['distinct']} distinct")
+        if 'min' in profile:
+            parts.append(f"{_short(profile['min'])}..{_short(profile['max'])}")
+        if profile.get('numeric_text'):
+            parts.append(f"{profile['numeric_text']:.0%} numeric text")
+        lines.append(f"- {profile['name']}: {', '.join(parts)}")
+    return '\n'.join(lines)
+
+
+def column_batches(columns, batch_size):
+    """Split columns into consecutive batches of at most batch_size."""
+    columns = list(columns)
+    return [columns[start:start + batch_size] for start in range(0, len(columns), batch_size)]
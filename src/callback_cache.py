@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# The file eviction is shared with the upload app's code cache at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from file_lru import FileLRU  # noqa: E402
+
+
+class CallbackCache:
+    """Bounded LRU/TTL memo for dashboard callback outputs.
+
+    Entries live in a small in-process LRU and in a directory of pickle files,
+    so every Dash worker process pointed at the same directory shares them.
+    File mtimes track last use: entries unused for longer than the TTL expire
+    and the least recently used files are removed beyond max_entries.
+    """
+
+    def __init__(self, directory, max_entries=512, ttl=3600, memory_entries=64):
+        self.directory = directory
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._files = FileLRU(directory, '.pkl', max_entries, ttl)
+
+    @staticmethod
+    def key_for(state):
+        payload = json.dumps(state, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        path = self._path(key)
+        try:
+            if self._files.expire(path, now):
+                raise FileNotFoundError(path)
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            self._files.touch(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self._stats['disk_hits'] += 1
+            self._remember(key, value, now)
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(key, value, time.time())
+        evicted = self._files.evict()
+        with self._lock:
+            self._stats['evictions'] += evicted
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for path in self._files.entries():
+            self._files.remove(path)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        stats['memory_entries'] = len(self._memory)
+        stats['disk_entries'] = len(self._files.entries())
+        return stats
+
+    def _remember(self, key, value, now):
+        self._memory[key] = (now, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
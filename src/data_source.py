@@ -0,0 +1,222 @@
+import hashlib
+import io
+import json
+import os
+import threading
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Column types for the sales CSV, so nothing is inferred and low-cardinality text is stored once.
+# Numbers are nullable so a blank value loads as missing instead of failing the whole parse.
+DTYPES = {
+    'customer_id': 'Int64',
+    'customer_name': 'str',
+    'age': 'float64',
+    'email': 'str',
+    'country': 'category',
+    'postal_code': 'str',
+    'purchase_amount': 'float64',
+    'product_name': 'category',
+    'sales_representative': 'category',
+}
+DATE_COLUMNS = ['purchase_date']
+
+# Bytes at the start of the CSV hashed to tell an append apart from a rewrite
+FINGERPRINT_BYTES = 64 * 1024
+
+# Schema metadata key of the Feather cache holding the CSV offset, mtime and fingerprint it covers
+CACHE_META_KEY = b'sales_data_source'
+
+
+class SalesDataSource:
+    """Sales rows from a CSV that only ever grows, kept in memory and in a binary cache.
+
+    The first load parses the whole CSV with fixed dtypes and writes it to a
+    Feather file whose schema metadata records how much of the CSV it covers.
+    Later loads (and refresh calls) compare the CSV's size and mtime with that
+    record and parse only the bytes appended since. A shrunk or rewritten CSV
+    falls back to a full parse.
+    """
+
+    def __init__(self, csv_path, cache_dir=None):
+        self.csv_path = csv_path
+        self.cache_path = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            name = os.path.splitext(os.path.basename(csv_path))[0]
+            self.cache_path = os.path.join(cache_dir, f'{name}.feather')
+        self.df = None
+        self.offset = 0
+        # Size and mtime of the CSV when it was last checked; the size can run past offset
+        # while a trailing line is still being written
+        self.size = None
+        self.mtime = None
+        self.fingerprint = None
+        self._header = None
+        self._cache_stale = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def version(self):
+        # Same CSV contents give the same version in every process
+        return f'{self.fingerprint[:16]}-{self.offset}'
+
+    def refresh(self, write_cache=True):
+        """Pick up rows appended to the CSV. Returns True when the frame changed.
+
+        The Feather cache is rewritten only with write_cache, so frequent callers
+        (every dashboard callback) can check for new rows without paying for it;
+        rows they picked up are written on the next refresh that allows it.
+        """
+        with self._lock:
+            stat = os.stat(self.csv_path)
+            if stat.st_size == self.size and stat.st_mtime == self.mtime:
+                changed = False
+            elif stat.st_size < self.offset or self._fingerprint(self.offset) != self.fingerprint:
+                print(f"{self.csv_path} was rewritten, reloading it")
+                self._parse_full()
+                changed = True
+            else:
+                changed = self._ingest_tail()
+                # Remember a trailing partial line so the next check does not read it again
+                self.size, self.mtime = stat.st_size, stat.st_mtime
+            self._cache_stale = self._cache_stale or changed
+            if write_cache and self._cache_stale:
+                self._write_cache()
+                self._cache_stale = False
+            return changed
+
+    def _load(self):
+        if self._read_cache():
+            print(f"Loaded {len(self.df)} rows from {self.cache_path}")
+            if self.refresh():
+                print(f"Appended rows since the cache was written, now {len(self.df)} rows")
+            return
+        self._parse_full()
+        self._write_cache()
+        print(f"Loaded {len(self.df)} rows from {self.csv_path}")
+
+    def _fingerprint(self, length):
+        digest = hashlib.sha256()
+        with open(self.csv_path, 'rb') as f:
+            digest.update(f.read(min(length, FINGERPRINT_BYTES)))
+        return digest.hexdigest()
+
+    def _read_csv(self, data):
+        return pd.read_csv(data, dtype=DTYPES, parse_dates=DATE_COLUMNS)
+
+    def _parse_full(self):
+        with open(self.csv_path, 'rb') as f:
+            data = f.read()
+        # A line still being written is left for the next refresh
+        end = data.rfind(b'\n') + 1
+        self._header = data[:data.find(b'\n') + 1]
+        self.df = self._read_csv(io.BytesIO(data[:end]))
+        self.offset = end
+        self.size = len(data)
+        self.mtime = os.stat(self.csv_path).st_mtime
+        self.fingerprint = self._fingerprint(end)
+
+    def _ingest_tail(self):
+        with open(self.csv_path, 'rb') as f:
+            if self._header is None:
+                self._header = f.readline()
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return False
+        tail = self._parse_tail(data[:end])
+        if tail is not None:
+            self.df = append_rows(self.df, tail)
+        grows_fingerprint = self.offset < FINGERPRINT_BYTES
+        self.offset += end
+        self.mtime = os.stat(self.csv_path).st_mtime
+        if grows_fingerprint:
+            self.fingerprint = self._fingerprint(self.offset)
+        return True
+
+    def _parse_tail(self, data):
+        # A tail that does not parse is retried line by line; lines that still fail are reported
+        # and skipped so they do not block every later refresh
+        try:
+            return self._read_csv(io.BytesIO(self._header + data))
+        except (ValueError, TypeError) as e:
+            print(f"Could not parse rows appended to {self.csv_path} ({e}), retrying line by line")
+        good, skipped = [], 0
+        for line in data.splitlines(keepends=True):
+            if not line.strip():
+                continue
+            try:
+                self._read_csv(io.BytesIO(self._header + line))
+                good.append(line)
+            except (ValueError, TypeError):
+                skipped += 1
+        print(f"Skipped {skipped} unparseable rows appended to {self.csv_path}")
+        if not good:
+            return None
+        return self._read_csv(io.BytesIO(self._header + b''.join(good)))
+
+    def _cache_meta(self, schema):
+        # How much of the CSV the cached frame covers, stored in the Feather file's own schema
+        # metadata so data and offset are always replaced together
+        raw = (schema.metadata or {}).get(CACHE_META_KEY)
+        return json.loads(raw) if raw else None
+
+    def _read_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            import pyarrow.feather as feather
+
+            table = feather.read_table(self.cache_path)
+            meta = self._cache_meta(table.schema)
+            if meta is None:
+                return False
+            # The cache only applies if the CSV still starts with the bytes it was built from
+            if os.path.getsize(self.csv_path) < meta['offset'] or self._fingerprint(meta['offset']) != meta['fingerprint']:
+                return False
+            self.df = table.to_pandas()
+        except (OSError, ValueError, KeyError, ImportError) as e:
+            print(f"Ignoring data cache: {e}")
+            return False
+        self.offset = self.size = meta['offset']
+        self.mtime = meta['mtime']
+        self.fingerprint = meta['fingerprint']
+        return True
+
+    def _write_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.feather as feather
+
+            # Another worker may already have written the same rows
+            try:
+                with pa.memory_map(self.cache_path, 'r') as source:
+                    meta = self._cache_meta(pa.ipc.open_file(source).schema)
+                if meta and meta['offset'] == self.offset and meta['fingerprint'] == self.fingerprint:
+                    return
+            except (OSError, ValueError, KeyError, pa.ArrowInvalid):
+                pass
+
+            table = pa.Table.from_pandas(self.df, preserve_index=False)
+            meta = {'offset': self.offset, 'mtime': self.mtime, 'fingerprint': self.fingerprint}
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), CACHE_META_KEY: json.dumps(meta)})
+            tmp_path = f'{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            feather.write_feather(table, tmp_path)
+            os.replace(tmp_path, self.cache_path)
+        except (OSError, ImportError) as e:
+            print(f"Could not write data cache: {e}")
+
+
+def append_rows(df, tail):
+    """Concatenate tail onto df, merging categories instead of falling back to object columns."""
+    combined = pd.concat([df, tail], ignore_index=True)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            combined[column] = union_categoricals([df[column], tail[column]], ignore_order=True)
+    return combined
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# pandas resample rules and chart labels for each time series granularity
+GRANULARITIES = (
+    ('D', 'Daily', 1),
+    ('W', 'Weekly', 7),
+    ('MS', 'Monthly', 31),
+)
+
+
+def histogram_bins(values, nbins=20):
+    """Count values into nbins equal-width bins, returning one row per non-empty bin.
+
+    The browser then draws nbins bars instead of binning every row itself.
+    """
+    values = pd.Series(values, dtype='float64').dropna().to_numpy()
+    if len(values) == 0:
+        return pd.DataFrame({'bin_start': [], 'bin_end': [], 'bin_center': [], 'count': []})
+    counts, edges = np.histogram(values, bins=nbins)
+    bins = pd.DataFrame({
+        'bin_start': edges[:-1],
+        'bin_end': edges[1:],
+        'bin_center': (edges[:-1] + edges[1:]) / 2,
+        'count': counts,
+    })
+    return bins[bins['count'] > 0]
+
+
+def choose_granularity(start, end, max_points):
+    """Finest of day/week/month whose number of periods over [start, end] fits in max_points."""
+    days = max((pd.Timestamp(end) - pd.Timestamp(start)).days + 1, 1)
+    for rule, label, period_days in GRANULARITIES:
+        if days / period_days <= max_points:
+            return rule, label
+    return GRANULARITIES[-1][:2]
+
+
+def resample_series(df, x, y, rule):
+    """Sum y into periods of the given rule, dropping periods with no data."""
+    if rule == 'D' or df.empty:
+        return df
+    resampled = df.set_index(x)[y].resample(rule).sum(min_count=1).dropna()
+    return resampled.reset_index()
+
+
+def lttb(df, x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of df to at most threshold rows.
+
+    Keeps the first and last points and, from each bucket in between, the point
+    forming the largest triangle with the previously kept point and the average
+    of the next bucket, which preserves the visual peaks and troughs of the line.
+    """
+    n = len(df)
+    if threshold >= n or threshold < 3:
+        return df
+    xs = df[x].to_numpy()
+    if np.issubdtype(xs.dtype, np.datetime64):
+        xs = xs.astype('datetime64[ns]').astype(np.int64)
+    xs = xs.astype('float64')
+    ys = df[y].to_numpy(dtype='float64')
+
+    # Interior points split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_lo, next_hi = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_lo, next_hi = n - 1, n
+        average_x = xs[next_lo:next_hi].mean()
+        average_y = ys[next_lo:next_hi].mean()
+        areas = np.abs(
+            (xs[previous] - average_x) * (ys[lo:hi] - ys[previous])
+            - (xs[previous] - xs[lo:hi]) * (average_y - ys[previous])
+        )
+        previous = lo + int(np.argmax(areas))
+        keep[bucket + 1] = previous
+    return df.iloc[keep]
+
+
+def time_series(df, x, y, start, end, max_points):
+    """Aggregate a daily series to a granularity that fits max_points, then LTTB whatever is still over.
+
+    Returns the frame and the granularity label ('Daily', 'Weekly' or 'Monthly').
+    """
+    rule, label = choose_granularity(start, end, max_points)
+    series = resample_series(df, x, y, rule)
+    return lttb(series, x, y, max_points), label
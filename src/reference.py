@@ -1,29 +1,66 @@
 # Import necessary libraries
 import os
-from dash import Dash, html, dcc, callback, Output, Input, ctx
+import threading
+from dash import Dash, html, dcc, callback, Output, Input, ctx, no_update
 import plotly.express as px
 import pandas as pd
 from datetime import timedelta
 from dotenv import load_dotenv
 import dash_bootstrap_components as dbc
+from flask import jsonify
+from sales_index import SalesIndex
+from callback_cache import CallbackCache
+from data_source import SalesDataSource
+import downsample
 
 # Load environment variables from .env file
 load_dotenv()
 
 def load_data():
-    while True:
-        try:
-            n = "sales_data_1.csv"
-            df = pd.read_csv(n)
-            df['purchase_date'] = pd.to_datetime(df['purchase_date'])
-            return df
-        except FileNotFoundError:
-            print("File not found. Please enter a valid file path.")
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            print("Please try again.")
+    # Typed CSV load backed by a Feather cache; later refreshes read only appended rows
+    return SalesDataSource(
+        os.getenv('SALES_DATA_PATH', 'sales_data_1.csv'),
+        cache_dir=os.getenv('DATA_CACHE_DIR', 'cache/data'),
+    )
+
+def create_app(source):
+    df = source.df
+
+    # Date-sorted index and daily cubes so callbacks slice and sum instead of scanning every row.
+    # Index and data version are swapped together when new rows arrive.
+    snapshot = (SalesIndex(df), source.version)
+    refresh_lock = threading.Lock()
+
+    def refresh_data(write_cache=True):
+        # A stat of the CSV unless rows were appended, in which case the index is rebuilt
+        nonlocal snapshot
+        with refresh_lock:
+            try:
+                changed = source.refresh(write_cache=write_cache)
+            except Exception as e:
+                print(f"Could not reload sales data: {e}")
+                return False
+            if changed:
+                snapshot = (SalesIndex(source.df), source.version)
+                print(f"Sales data reloaded: {len(source.df)} rows")
+            return changed
+
+    def country_options(df):
+        return [{'label': 'Select All', 'value': 'ALL'}] + [{'label': i, 'value': i} for i in df.country.unique()]
+
+    # Memoized callback outputs, shared by every worker process that uses the same directory
+    dashboard_cache = CallbackCache(
+        os.getenv('DASHBOARD_CACHE_DIR', 'cache/dashboard'),
+        max_entries=int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', '512')),
+        ttl=int(os.getenv('DASHBOARD_CACHE_TTL_SECONDS', '3600')),
+        memory_entries=int(os.getenv('DASHBOARD_CACHE_MEMORY_ENTRIES', '64')),
+    )
+
+    # Upper bounds on what each figure sends to the browser, whatever the row count
+    max_points = int(os.getenv('DASHBOARD_MAX_POINTS', '1000'))
+    max_bars = int(os.getenv('DASHBOARD_MAX_BARS', '100'))
+    age_bins = 20
 
-def create_app(df):
     # Initialize the Dash app
     app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
@@ -65,7 +102,6 @@ def create_app(df):
     }
 
     # Update the dropdown options to include 'Select All'
-    country_options = [{'label': 'Select All', 'value': 'ALL'}] + [{'label': i, 'value': i} for i in df.country.unique()]
 
     # Layout of the dashboard
     app.layout = dbc.Container([
@@ -85,7 +121,7 @@ def create_app(df):
                     html.Label('Country', style={'fontWeight': 'bold', 'marginBottom': '5px', 'color': colors['text']}),
                     dcc.Dropdown(
                         id='dropdown-country',
-                        options=country_options,
+                        options=country_options(df),
                         value=['ALL'],  # Default value as a list with 'ALL' selected
                         multi=True,  # Enable multi-select
                         style={'width': '300px'}  # Increased width to accommodate multiple selections
@@ -106,6 +142,10 @@ def create_app(df):
                 ])
             ], style=filter_style),
             
+            # Polls the CSV for appended rows
+            dcc.Interval(id='data-refresh', interval=int(os.getenv('DATA_REFRESH_SECONDS', '60')) * 1000),
+            dcc.Store(id='data-version', data=source.version),
+
             # KPI indicators section
             html.Div(id='kpi-indicators', style={'margin': '30px 0'}),
             
@@ -132,6 +172,18 @@ def create_app(df):
         })
     ], fluid=True)
 
+    @callback(
+        [Output('data-version', 'data'),
+         Output('dropdown-country', 'options')],
+        Input('data-refresh', 'n_intervals'),
+        prevent_initial_call=True
+    )
+    def reload_data(n_intervals):
+        if not refresh_data():
+            return no_update, no_update
+        index, version = snapshot
+        return version, country_options(index.df)
+
     # Callback function for updating the dashboard
     @callback(
         [Output('kpi-indicators', 'children'),
@@ -147,57 +199,65 @@ def create_app(df):
          Input('product-sales', 'clickData'),
          Input('sales-rep-performance', 'clickData'),
          Input('age-distribution', 'selectedData'),
-         Input('reset-button', 'n_clicks')]
+         Input('reset-button', 'n_clicks'),
+         Input('data-version', 'data')]
     )
-    def update_dashboard(countries, start_date, end_date, customer_click, product_click, sales_rep_click, age_selection, reset_clicks):
+    def update_dashboard(countries, start_date, end_date, customer_click, product_click, sales_rep_click, age_selection, reset_clicks, data_version):
+        # Other worker processes may have missed the interval, so check for new rows here too;
+        # the Feather cache is left to the interval refresh
+        refresh_data(write_cache=False)
+        index, version = snapshot
+
         # Convert string dates to datetime
         start_date = pd.to_datetime(start_date)
         end_date = pd.to_datetime(end_date)
         
         # Handle 'Select All' option
-        if 'ALL' in countries:
-            dff = df
-        else:
-            dff = df[df.country.isin(countries)]
-        
-        # Filter the dataframe based on selected date range
-        dff = dff[(dff.purchase_date >= start_date) & (dff.purchase_date <= end_date)]
+        selected_countries = None if 'ALL' in countries else countries
         
         # Apply cross-filtering based on chart interactions
+        row_filter = None
         if ctx.triggered:
             input_id = ctx.triggered[0]['prop_id'].split('.')[0]
             if input_id == 'reset-button':
                 # Reset all filters
-                dff = df[(df.purchase_date >= start_date) & (df.purchase_date <= end_date)]
+                selected_countries = None
             elif input_id == 'customer-purchase' and customer_click:
-                customer = customer_click['points'][0]['x']
-                dff = dff[dff['customer_name'] == customer]
+                row_filter = ('customer_name', customer_click['points'][0]['x'])
             elif input_id == 'product-sales' and product_click:
-                product = product_click['points'][0]['x']
-                dff = dff[dff['product_name'] == product]
+                row_filter = ('product_name', product_click['points'][0]['x'])
             elif input_id == 'sales-rep-performance' and sales_rep_click:
-                sales_rep = sales_rep_click['points'][0]['x']
-                dff = dff[dff['sales_representative'] == sales_rep]
+                row_filter = ('sales_representative', sales_rep_click['points'][0]['x'])
             elif input_id == 'age-distribution' and age_selection:
-                age_range = [age_selection['range']['x'][0], age_selection['range']['x'][1]]
-                dff = dff[(dff['age'] >= age_range[0]) & (dff['age'] <= age_range[1])]
+                row_filter = ('age', (age_selection['range']['x'][0], age_selection['range']['x'][1]))
 
+        # Same filter state gives the same outputs, whatever order the countries were picked in
+        cache_key = dashboard_cache.key_for({
+            'countries': sorted(selected_countries) if selected_countries is not None else None,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'row_filter': row_filter,
+            'data_version': version,
+        })
+        cached = dashboard_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Summaries for the selected period and for the same period 6 months ago
+        current = index.query(start_date, end_date, selected_countries, row_filter)
+        past = index.query(start_date - timedelta(days=180), end_date - timedelta(days=180))
         
         # Calculate KPI values for the selected period
-        total_revenue = dff['purchase_amount'].sum()
-        total_customers = dff['customer_id'].nunique()
-        average_order_value = dff['purchase_amount'].mean()
-        total_orders = dff['purchase_date'].count()
+        total_revenue = current.revenue
+        total_customers = current.customers
+        average_order_value = current.average_order_value
+        total_orders = current.orders
         
-        # Calculate KPI values for 6 months ago
-        past_start_date = start_date - timedelta(days=180)
-        past_end_date = end_date - timedelta(days=180)
-        past_dff = df[(df.purchase_date >= past_start_date) & (df.purchase_date <= past_end_date)]
-        
-        past_total_revenue = past_dff['purchase_amount'].sum()
-        past_total_customers = past_dff['customer_id'].nunique()
-        past_average_order_value = past_dff['purchase_amount'].mean()
-        past_total_orders = past_dff['purchase_date'].count()
+        # KPI values for 6 months ago
+        past_total_revenue = past.revenue
+        past_total_customers = past.customers
+        past_average_order_value = past.average_order_value
+        past_total_orders = past.orders
         
         # Calculate changes
         revenue_change = total_revenue - past_total_revenue
@@ -258,48 +318,65 @@ def create_app(df):
             fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
             return fig
         
-        # Create graphs with interactivity
-        time_series = px.line(dff.groupby('purchase_date')['purchase_amount'].sum().reset_index(), 
+        # Create graphs with interactivity; the series is resampled and downsampled to max_points
+        sales_over_time, granularity = downsample.time_series(current.daily, 'purchase_date', 'purchase_amount',
+                                                              start_date, end_date, max_points)
+        time_series = px.line(sales_over_time, 
                               x='purchase_date', y='purchase_amount', 
-                              title="Daily Sales Over Time",
+                              title=f"{granularity} Sales Over Time",
                               labels={'purchase_date': 'Date', 'purchase_amount': 'Total Sales'})
         time_series.update_traces(mode='lines+markers', hovertemplate='Date: %{x}<br>Sales: $%{y:,.2f}')
         time_series = update_chart_layout(time_series)
 
         # Create graphs with interactivity and improved tooltips
-        customer_purchase = px.bar(dff.groupby('customer_name')['purchase_amount'].sum().reset_index().sort_values('purchase_amount', ascending=False).head(10), 
+        customer_purchase = px.bar(current.totals_by['customer_name'].head(10), 
                                    x='customer_name', y='purchase_amount', title="Top 10 Customers by Purchase Amount",
                                    color_discrete_sequence=[colors['primary']], 
                                    labels={'customer_name': 'Customer Name', 'purchase_amount': 'Purchase Amount'})
         customer_purchase.update_traces(hovertemplate='Customer: %{x}<br>Total Purchase: $%{y:,.2f}')
         customer_purchase = update_chart_layout(customer_purchase)
         
-        product_sales = px.bar(dff.groupby('product_name')['purchase_amount'].sum().reset_index().sort_values('purchase_amount', ascending=False).head(10), 
+        product_sales = px.bar(current.totals_by['product_name'].head(10), 
                                x='product_name', y='purchase_amount', title="Top 10 Products by Sales",
                                color_discrete_sequence=[colors['primary']], 
                                labels={'product_name':'Product Name','purchase_amount':'Sales Amount'})
         product_sales.update_traces(hovertemplate='Product: %{x}<br>Total Sales: $%{y:,.2f}')
         product_sales = update_chart_layout(product_sales)
         
-        sales_rep_performance = px.bar(dff.groupby('sales_representative')['purchase_amount'].sum().reset_index().sort_values('purchase_amount', ascending=False), 
-                                       x='sales_representative', y='purchase_amount', title="Sales Representative Performance",
+        sales_reps = current.totals_by['sales_representative']
+        sales_rep_title = "Sales Representative Performance"
+        if len(sales_reps) > max_bars:
+            sales_reps = sales_reps.head(max_bars)
+            sales_rep_title = f"Top {max_bars} Sales Representatives"
+        sales_rep_performance = px.bar(sales_reps, 
+                                       x='sales_representative', y='purchase_amount', title=sales_rep_title,
                                        color_discrete_sequence=[colors['primary']], 
                                        labels={'sales_representative':'Sales Representative','purchase_amount':'Total Sales'})
         sales_rep_performance.update_traces(hovertemplate='Sales Rep: %{x}<br>Total Sales: $%{y:,.2f}')
         sales_rep_performance = update_chart_layout(sales_rep_performance)
         
-        age_distribution = px.histogram(dff, x='age', nbins=20, title="Customer Age Distribution",
-                                        color_discrete_sequence=[colors['primary']], labels={'age':'Age', 'count':'Number of Customers'})
-        age_distribution.update_traces(hovertemplate='Age: %{x}<br>Number of Customers: %{y}')
+        # Bins are counted here and drawn as bars, so only age_bins values reach the browser
+        age_counts = downsample.histogram_bins(current.ages, age_bins)
+        age_distribution = px.bar(age_counts, x='bin_center', y='count', title="Customer Age Distribution",
+                                  custom_data=['bin_start', 'bin_end'],
+                                  color_discrete_sequence=[colors['primary']], labels={'bin_center':'Age', 'count':'Number of Customers'})
+        age_distribution.update_traces(width=age_counts['bin_end'] - age_counts['bin_start'],
+                                       hovertemplate='Age: %{customdata[0]:.0f}-%{customdata[1]:.0f}<br>Number of Customers: %{y}')
         age_distribution = update_chart_layout(age_distribution)
         
-        return kpi_indicators, time_series, customer_purchase, product_sales, sales_rep_performance, age_distribution
+        outputs = (kpi_indicators, time_series, customer_purchase, product_sales, sales_rep_performance, age_distribution)
+        dashboard_cache.put(cache_key, outputs)
+        return outputs
+
+    @app.server.route('/cache-stats')
+    def cache_stats():
+        return jsonify(dashboard_cache.stats())
 
     return app
 
 def main():
-    df = load_data()
-    app = create_app(df)
+    source = load_data()
+    app = create_app(source)
     app.run(debug=True)
 
 if __name__ == '__main__':
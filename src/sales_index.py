@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+# Columns the dashboard filters and groups by
+DIMENSIONS = ('country', 'customer_name', 'product_name', 'sales_representative')
+
+# Measures stored in every cube; raw rows carry the same columns with one row each
+MEASURES = ('amount', 'amount_count', 'rows')
+
+
+class SalesSummary:
+    """Everything update_dashboard needs for one filter state."""
+
+    def __init__(self, revenue, orders, amount_count, customers, daily, totals_by, ages):
+        self.revenue = revenue
+        self.orders = orders
+        self.customers = customers
+        # Matches Series.mean(): NaN amounts are skipped, an empty selection gives NaN
+        self.average_order_value = revenue / amount_count if amount_count else float('nan')
+        self.daily = daily
+        self.totals_by = totals_by
+        self.ages = ages
+
+
+class SalesIndex:
+    """Date-sorted, category-encoded view of the sales data with daily pre-aggregated cubes.
+
+    Rows are sorted by purchase_date so a date range is a contiguous slice found
+    with searchsorted. Each dimension is stored as integer category codes, and
+    for every dimension there is a cube of amount sums and counts by
+    (day, country, dimension). Queries without a cross-filter read only the
+    cubes; cross-filtered queries (a clicked bar or an age selection) scan the
+    raw rows of the date slice using the integer codes.
+    """
+
+    def __init__(self, df):
+        df = df.sort_values('purchase_date', kind='stable').reset_index(drop=True)
+        self.df = df
+
+        dates = df['purchase_date'].to_numpy()
+        valid = ~pd.isna(dates)
+        # NaT sorts last, so the dated rows form a prefix
+        self.days, day_index = np.unique(dates[valid], return_inverse=True)
+        day = np.full(len(df), -1, dtype=np.int64)
+        day[valid] = day_index
+        # Raw rows for days [i, j) are day_starts[i]:day_starts[j]
+        self.day_starts = np.searchsorted(day_index, np.arange(len(self.days) + 1))
+
+        amount = df['purchase_amount'].to_numpy(dtype='float64', na_value=np.nan)
+        present = ~np.isnan(amount)
+        self.raw = {
+            'day': day,
+            'amount': np.where(present, amount, 0.0),
+            'amount_count': present.astype(np.int64),
+            'rows': np.ones(len(df), dtype=np.int64),
+        }
+        self.categories = {}
+        for dimension in DIMENSIONS:
+            categorical = pd.Categorical(df[dimension])
+            self.categories[dimension] = categorical.categories
+            self.raw[dimension] = categorical.codes.astype(np.int64)
+        self.customer_ids = df['customer_id'].to_numpy(dtype='float64', na_value=np.nan)
+        self.ages = df['age']
+
+        self.cubes = {'totals': self._build_cube(['country'])}
+        for dimension in DIMENSIONS[1:]:
+            self.cubes[dimension] = self._build_cube(['country', dimension])
+
+    def _build_cube(self, keys):
+        columns = ['day'] + keys
+        frame = pd.DataFrame({name: self.raw[name] for name in columns + list(MEASURES)})
+        frame = frame[frame['day'] >= 0]
+        cube = frame.groupby(columns, sort=True).sum().reset_index()
+        return {name: cube[name].to_numpy() for name in cube.columns}
+
+    def _day_range(self, start, end):
+        # Same bounds as purchase_date >= start & purchase_date <= end
+        return (
+            int(np.searchsorted(self.days, np.datetime64(start), 'left')),
+            int(np.searchsorted(self.days, np.datetime64(end), 'right')),
+        )
+
+    def _country_codes(self, countries):
+        if countries is None:
+            return None
+        codes = self.categories['country'].get_indexer(list(countries))
+        # Unknown names come back as -1, which is also the code of missing values
+        return codes[codes >= 0]
+
+    def query(self, start, end, countries=None, row_filter=None):
+        """Summarize sales between start and end (inclusive).
+
+        countries: names to keep, or None for all of them.
+        row_filter: None, (dimension, value) for a clicked bar, or ('age', (low, high)).
+        """
+        first_day, last_day = self._day_range(start, end)
+        country_codes = self._country_codes(countries)
+
+        # Raw rows of the date range, narrowed by country and cross-filter
+        row_start, row_end = self.day_starts[first_day], self.day_starts[max(first_day, last_day)]
+        raw = {name: values[row_start:row_end] for name, values in self.raw.items()}
+        mask = np.ones(row_end - row_start, dtype=bool)
+        if country_codes is not None:
+            mask &= np.isin(raw['country'], country_codes)
+        if row_filter is not None:
+            column, value = row_filter
+            if column == 'age':
+                ages = self.ages.iloc[row_start:row_end]
+                mask &= ((ages >= value[0]) & (ages <= value[1])).to_numpy()
+            else:
+                code = self.categories[column].get_indexer([value])[0]
+                if code < 0:
+                    # A value not in the data matches nothing, not the rows where it is missing
+                    mask[:] = False
+                else:
+                    mask &= raw[column] == code
+
+        if row_filter is None:
+            # No cross-filter: every aggregate comes from the cubes
+            tables = {}
+            for name, cube in self.cubes.items():
+                lo, hi = np.searchsorted(cube['day'], [first_day, last_day], 'left')
+                selected = {key: values[lo:hi] for key, values in cube.items()}
+                if country_codes is not None:
+                    keep = np.isin(selected['country'], country_codes)
+                    selected = {key: values[keep] for key, values in selected.items()}
+                tables[name] = selected
+        else:
+            selected = {name: values[mask] for name, values in raw.items()}
+            tables = dict.fromkeys(self.cubes, selected)
+
+        totals = tables['totals']
+        revenue = float(totals['amount'].sum())
+        orders = int(totals['rows'].sum())
+        amount_count = int(totals['amount_count'].sum())
+
+        # Daily series over the days that have at least one sale
+        day_offsets = totals['day'] - first_day
+        length = max(last_day - first_day, 0)
+        daily_amount = np.bincount(day_offsets, weights=totals['amount'], minlength=length)
+        daily_rows = np.bincount(day_offsets, weights=totals['rows'], minlength=length)
+        has_sales = daily_rows > 0
+        daily = pd.DataFrame({
+            'purchase_date': self.days[first_day:last_day][has_sales],
+            'purchase_amount': daily_amount[has_sales],
+        })
+
+        totals_by = {}
+        for dimension in DIMENSIONS[1:]:
+            table = tables[dimension]
+            codes = table[dimension]
+            known = codes >= 0
+            size = len(self.categories[dimension])
+            amounts = np.bincount(codes[known], weights=table['amount'][known], minlength=size)
+            counts = np.bincount(codes[known], weights=table['rows'][known], minlength=size)
+            seen = counts > 0
+            totals_by[dimension] = pd.DataFrame({
+                dimension: self.categories[dimension][seen],
+                'purchase_amount': amounts[seen],
+            }).sort_values('purchase_amount', ascending=False)
+
+        # Distinct customers is not additive across cube cells, so count it from the raw slice
+        customers = pd.unique(self.customer_ids[row_start:row_end][mask])
+        customers = int(pd.notna(customers).sum())
+        ages = self.ages.iloc[row_start:row_end][mask]
+
+        return SalesSummary(revenue, orders, amount_count, customers, daily, totals_by, ages)
@@ -0,0 +1,76 @@
+var POLL_INTERVAL_MS = 2000;
+
+function showLoading(visible) {
+    document.getElementById('loading').style.display = visible ? 'block' : 'none';
+}
+
+function failProcessing(error) {
+    console.error('Error:', error);
+    showLoading(false);
+    alert('A quantum fluctuation occurred during processing. Please try again.');
+}
+
+function downloadResult(resultUrl, downloadName) {
+    return fetch(resultUrl)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Result download failed with status ' + response.status);
+            }
+            return response.blob();
+        })
+        .then(blob => {
+            showLoading(false);
+            document.getElementById('analysis-done').style.display = 'block';
+
+            // Create a link to download the file
+            var url = window.URL.createObjectURL(blob);
+            var a = document.createElement('a');
+            a.href = url;
+            var extension = downloadName ? downloadName.substring(downloadName.lastIndexOf('.')) : '.csv';
+            a.download = 'enhanced_data_matrix' + extension;
+            document.body.appendChild(a);
+            a.click();
+            window.URL.revokeObjectURL(url);
+        });
+}
+
+function pollJob(statusUrl) {
+    fetch(statusUrl)
+        .then(response => response.json())
+        .then(job => {
+            if (job.status === 'done') {
+                return downloadResult(job.result_url, job.download_name);
+            }
+            if (job.status === 'failed' || job.error) {
+                throw new Error(job.error || 'Job failed');
+            }
+            // Still queued or running, check again shortly
+            setTimeout(function() { pollJob(statusUrl); }, POLL_INTERVAL_MS);
+        })
+        .catch(failProcessing);
+}
+
+document.getElementById('uploadForm').addEventListener('submit', function(e) {
+    e.preventDefault();
+    document.getElementById('analysis-done').style.display = 'none';
+    showLoading(true);
+
+    var formData = new FormData(this);
+    fetch('/jobs', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json().then(body => {
+        if (!response.ok) {
+            throw new Error(body.error || 'Job submission failed');
+        }
+        return body;
+    }))
+    .then(job => pollJob(job.status_url))
+    .catch(failProcessing);
+});
+
+document.getElementById('fileInput').addEventListener('change', function(e) {
+    var fileName = e.target.files[0].name;
+    document.querySelector('.file-input-wrapper .btn').textContent = 'Matrix Selected: ' + fileName;
+});
@@ -0,0 +1,49 @@
+import importlib
+import os
+
+import pandas as pd
+import pytest
+
+# Drops the batch's first column and derives two new ones from it
+DROPPING_CODE = """```python
+first = df.columns[0]
+df[f'{first}_len'] = df[first].astype(str).str.len()
+df[f'{first}_copy'] = df[first]
+df = df.drop(columns=[first])
+```"""
+
+
+class Backend:
+    def generate(self, prompt):
+        return DROPPING_CODE
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    for name in ('CODE_CACHE_DIR', 'JOB_DIR', 'PIPELINE_DIR', 'PROFILE_DIR'):
+        monkeypatch.setenv(name, str(tmp_path / name.lower()))
+    monkeypatch.setenv('SANDBOX_WORKERS', '0')
+    monkeypatch.setenv('LLM_BACKEND', 'stub')
+    monkeypatch.setenv('PROMPT_BATCH_COLUMNS', '3')
+    import llm
+    llm.set_client(llm.LLMClient(Backend(), rate=0))
+    import app
+    app = importlib.reload(app)
+    yield app
+    llm.set_client(None)
+
+
+def test_batch_that_drops_a_column(app):
+    df = pd.DataFrame({column: range(5) for column in 'abcdefg'})
+    report = {}
+    merged, code = app.generate_feature_code(df, report)
+
+    assert len(report['batches']) == 3 and all(batch['ok'] for batch in report['batches'])
+    # Dropped originals stay, every batch's new columns are added
+    assert list(merged.columns[:7]) == list('abcdefg')
+    assert {'a_len', 'a_copy', 'd_len', 'd_copy', 'g_len', 'g_copy'} <= set(merged.columns)
+
+    # The cached program gives the same frame as the in-process merge
+    from sandbox import run_code
+    replayed, _ = run_code(code, df.copy())
+    pd.testing.assert_frame_equal(replayed, merged)
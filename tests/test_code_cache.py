@@ -0,0 +1,25 @@
+import os
+
+import pandas as pd
+import pytest
+
+from code_cache import CodeCache
+
+
+def test_round_trip(tmp_path):
+    cache = CodeCache(str(tmp_path))
+    key = cache.key_for(pd.DataFrame({'a': [1]}), 'prompt')
+    cache.put(key, "df['b'] = df['a']")
+    assert cache.get(key) == "df['b'] = df['a']"
+    assert cache.invalidate(key) == 1
+    assert cache.get(key) is None
+
+
+@pytest.mark.parametrize('key', ['/tmp/victim', '../pipelines/demo/1', 'A' * 64, ''])
+def test_rejects_keys_that_are_not_digests(tmp_path, key):
+    outside = tmp_path / 'victim.json'
+    outside.write_text('{}')
+    cache = CodeCache(str(tmp_path / 'cache'))
+    with pytest.raises(ValueError):
+        cache.invalidate(key)
+    assert os.path.exists(outside)
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# The dashboard modules import each other as siblings from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from data_source import SalesDataSource  # noqa: E402
+
+HEADER = ('customer_id,customer_name,age,email,country,postal_code,purchase_amount,'
+          'product_name,sales_representative,purchase_date\n')
+
+
+def row(i, country='US'):
+    return f'{i},Name {i},{20 + i % 50},c{i}@example.com,{country},1000{i % 10},{i}.5,Product A,Rep {i % 3},2024-01-{1 + i % 28:02d}\n'
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'sales.csv'
+    path.write_text(HEADER + ''.join(row(i) for i in range(100)))
+    return str(path)
+
+
+def append(path, text):
+    with open(path, 'a') as f:
+        f.write(text)
+
+
+def test_cache_is_one_file_that_loads_with_dtypes(tmp_path, csv_path):
+    first = SalesDataSource(csv_path, str(tmp_path / 'cache'))
+    assert os.listdir(tmp_path / 'cache') == ['sales.feather']
+
+    second = SalesDataSource(csv_path, str(tmp_path / 'cache'))
+    assert second.version == first.version
+    pd.testing.assert_frame_equal(second.df, first.df)
+    assert isinstance(second.df['country'].dtype, pd.CategoricalDtype)
+
+
+def test_workers_sharing_a_cache_do_not_duplicate_rows(tmp_path, csv_path):
+    cache_dir = str(tmp_path / 'cache')
+    first = SalesDataSource(csv_path, cache_dir)
+    append(csv_path, ''.join(row(i) for i in range(100, 110)))
+    # One worker picks up the rows and rewrites the cache; another starts from that cache
+    assert first.refresh()
+    second = SalesDataSource(csv_path, cache_dir)
+    append(csv_path, ''.join(row(i) for i in range(110, 120)))
+    assert first.refresh() and second.refresh()
+    assert len(first.df) == len(second.df) == 120
+    assert second.df['customer_id'].tolist() == list(range(120))
+
+
+def test_blank_numbers_load_as_missing(tmp_path, csv_path):
+    append(csv_path, ',Blank,,b@example.com,US,10001,1.5,Product A,Rep 1,2024-01-02\n')
+    source = SalesDataSource(csv_path, str(tmp_path / 'cache'))
+    assert len(source.df) == 101
+    assert source.df['customer_id'].isna().sum() == 1 and source.df['age'].isna().sum() == 1
+
+
+def test_unparseable_tail_rows_are_skipped(tmp_path, csv_path):
+    source = SalesDataSource(csv_path, str(tmp_path / 'cache'))
+    append(csv_path, row(100) + 'not-a-number,Bad,30,x@example.com,US,1,1.0,Product A,Rep 1,2024-01-02\n' + row(101))
+    assert source.refresh()
+    assert source.df['customer_id'].tolist()[-2:] == [100, 101]
+    # Later rows keep loading
+    append(csv_path, row(102))
+    assert source.refresh()
+    assert source.df['customer_id'].tolist()[-1] == 102
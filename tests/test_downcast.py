@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from downcast import optimize_dtypes
+
+
+def frame():
+    return pd.DataFrame({
+        'country': ['US', 'IN', 'US', 'DE'] * 50,
+        'epoch': np.arange(200, dtype='int64') + 1_700_000_000,
+        'small': np.arange(200, dtype='int64') % 5,
+        'half': np.arange(200, dtype='float64') / 2,
+        'price': np.linspace(0.1, 9.9, 200),
+    })
+
+
+def test_numbers_are_downcast_only_when_asked():
+    df = frame()
+    result = optimize_dtypes(df, numbers=False)
+    assert str(df['country'].dtype) == 'category'
+    assert df['epoch'].dtype == np.int64 and df['small'].dtype == np.int64
+    assert df['half'].dtype == np.float64
+    assert result['bytes_saved'] > 0
+
+    # Arithmetic on an untouched input column must not wrap around
+    assert (df['epoch'] * 1000).min() == 1_700_000_000_000
+
+
+def test_output_downcasting_is_lossless():
+    df = frame()
+    original = df.copy()
+    result = optimize_dtypes(df)
+    assert df['small'].dtype == np.int8
+    assert df['epoch'].dtype == np.int32
+    assert df['half'].dtype == np.float32
+    # 0.1 steps are not exact in float32, so price stays float64
+    assert df['price'].dtype == np.float64
+    assert set(result['columns']) == {'country', 'epoch', 'small', 'half'}
+    pd.testing.assert_frame_equal(df.astype(original.dtypes.to_dict()), original)
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+from code_cache import CodeCache
+from file_lru import FileLRU
+
+# The dashboard modules import each other as siblings from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from callback_cache import CallbackCache  # noqa: E402
+
+
+def make_entries(directory, count, suffix='.json'):
+    # Oldest first, one second apart
+    paths = []
+    now = time.time()
+    for i in range(count):
+        path = os.path.join(directory, f'{i}{suffix}')
+        with open(path, 'w') as f:
+            f.write('{}')
+        os.utime(path, (now - count + i, now - count + i))
+        paths.append(path)
+    return paths
+
+
+def test_evicts_expired_then_least_recently_used(tmp_path):
+    files = FileLRU(str(tmp_path), '.json', max_entries=2, ttl=3.5)
+    paths = make_entries(str(tmp_path), 5)
+    (tmp_path / 'other.txt').write_text('kept')
+    files.touch(paths[0])
+
+    # 1 expired; 0 (just touched), 3 and 4 are live and 3 is the least recently used
+    assert files.evict() == 3
+    assert sorted(os.listdir(tmp_path)) == ['0.json', '4.json', 'other.txt']
+
+
+def test_both_caches_share_the_eviction(tmp_path):
+    code_cache = CodeCache(str(tmp_path / 'code'), max_entries=2)
+    for i in range(3):
+        key = code_cache.key_for(pd.DataFrame({f'c{i}': [1]}), 'prompt')
+        code_cache.put(key, f'# {i}')
+        time.sleep(0.01)
+    assert code_cache.stats()['entries'] == 2 and code_cache.evictions == 1
+
+    callback_cache = CallbackCache(str(tmp_path / 'callbacks'), max_entries=2, memory_entries=0)
+    for i in range(3):
+        callback_cache.put(callback_cache.key_for({'i': i}), i)
+        time.sleep(0.01)
+    stats = callback_cache.stats()
+    assert stats['disk_entries'] == 2 and stats['evictions'] == 1
+    assert callback_cache.get(callback_cache.key_for({'i': 2})) == 2
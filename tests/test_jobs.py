@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+from jobs import BOOT_ID, JobQueue, JobStore
+
+
+def dead_owner():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return f'{BOOT_ID}:{process.pid}'
+
+
+def test_jobs_left_pending_by_a_restart_are_failed(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    jobs = (
+        ('queued-job', 'queued', dead_owner()),
+        ('running-job', 'running', dead_owner()),
+        ('old-boot-job', 'running', f'previous-boot:{os.getpid()}'),
+        ('done-job', 'done', dead_owner()),
+    )
+    for job_id, status, owner in jobs:
+        input_path = tmp_path / f'{job_id}.input'
+        input_path.write_text('a\n1\n')
+        store.create(job_id, str(input_path))
+        store.update(job_id, status=status, owner=owner)
+
+    JobQueue(store, lambda *args: None, str(tmp_path), max_pending=1)
+
+    assert store.count_pending() == 0
+    for job_id in ('queued-job', 'running-job', 'old-boot-job'):
+        job = store.get(job_id)
+        assert job['status'] == 'failed'
+        assert job['error'] == 'interrupted by restart'
+        assert not os.path.exists(job['input_path'])
+    assert store.get('done-job')['status'] == 'done'
+    assert os.path.exists(store.get('done-job')['input_path'])
+
+
+def test_jobs_of_live_workers_are_kept(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    input_path = tmp_path / 'live-job.input'
+    input_path.write_text('a\n1\n')
+    # Created by this process, as another worker sharing the database would
+    store.create('live-job', str(input_path))
+    store.update('live-job', status='running')
+
+    JobQueue(store, lambda *args: None, str(tmp_path))
+
+    assert store.get('live-job')['status'] == 'running'
+    assert os.path.exists(input_path)
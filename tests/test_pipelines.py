@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from pipelines import PipelineError, PipelineStore, SchemaMismatchError, apply_pipeline, apply_to_file
+
+CODE = "df['amount_k'] = df['amount'] * 1000\ndf['label'] = df['country'].astype(str) + '-x'"
+
+
+def upload():
+    return pd.DataFrame({'country': ['US', 'IN', 'US', 'DE'] * 5, 'amount': range(20)})
+
+
+def save(store, optimize):
+    df = upload()
+    if optimize['input']:
+        df['country'] = df['country'].astype('category')
+    processed_df = df.copy()
+    exec(CODE, {'df': processed_df})
+    if optimize['output']:
+        processed_df['label'] = processed_df['label'].astype('category')
+    return store.save('sales', CODE, df, processed_df, optimize=optimize)
+
+
+def test_saved_versions(tmp_path):
+    store = PipelineStore(str(tmp_path))
+    first = save(store, {'input': False, 'output': False})
+    second = save(store, {'input': False, 'output': False})
+    assert (first['version'], second['version']) == (1, 2)
+    assert store.get('sales')['version'] == 2
+    assert store.get('sales', 1)['schema_hash'] == first['schema_hash']
+    assert store.list() == [{'name': 'sales', 'versions': [1, 2], 'latest': 2}]
+    with pytest.raises(PipelineError):
+        store.get('../sales')
+
+
+def test_cli_and_endpoint_paths_apply_the_saved_optimization(tmp_path):
+    store = PipelineStore(str(tmp_path / 'pipelines'))
+    artifact = save(store, {'input': True, 'output': True, 'max_category_ratio': 0.5, 'arrow_strings': False})
+
+    # In-process, as the endpoint does without a sandbox pool
+    processed_df, warnings = apply_pipeline(artifact, upload())
+    assert warnings == []
+    assert str(processed_df['country'].dtype) == 'category'
+    assert str(processed_df['label'].dtype) == 'category'
+
+    # From a file, as the command line does in its worker processes
+    upload().to_csv(tmp_path / 'in.csv', index=False)
+    result = apply_to_file(artifact, str(tmp_path / 'in.csv'), str(tmp_path / 'out.parquet'), 'parquet')
+    assert result['warnings'] == []
+    assert pd.read_parquet(tmp_path / 'out.parquet').dtypes.astype(str).to_dict() == \
+        processed_df.dtypes.astype(str).to_dict()
+
+
+def test_missing_columns_are_rejected(tmp_path):
+    artifact = save(PipelineStore(str(tmp_path)), {'input': False, 'output': False})
+    with pytest.raises(SchemaMismatchError):
+        apply_pipeline(artifact, upload()[['amount']])
+
+
+def test_integers_that_no_longer_fit_are_not_wrapped(tmp_path):
+    artifact = save(PipelineStore(str(tmp_path)), {'input': False, 'output': False})
+    artifact['output_dtypes'] = [[column, 'int8' if column == 'amount_k' else dtype]
+                                 for column, dtype in artifact['output_dtypes']]
+    processed_df, warnings = apply_pipeline(artifact, upload())
+    assert processed_df['amount_k'].max() == 19000
+    assert warnings == ['amount_k: could not cast to the saved dtype']
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The dashboard modules import each other as siblings from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from sales_index import SalesIndex  # noqa: E402
+
+START, END = '2024-01-01', '2024-01-31'
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    size = 500
+    frame = pd.DataFrame({
+        'customer_id': pd.array(rng.integers(0, 50, size), dtype='Int64'),
+        'customer_name': rng.choice(['Ann', 'Bob', 'Cy', None], size),
+        'age': rng.integers(18, 80, size).astype('float64'),
+        'country': rng.choice(['US', 'DE', 'FR', None], size),
+        'purchase_amount': rng.uniform(1, 100, size).round(2),
+        'product_name': rng.choice(['Product A', 'Product B', None], size),
+        'sales_representative': rng.choice(['Rep 1', 'Rep 2', None], size),
+        'purchase_date': pd.Timestamp(START) + pd.to_timedelta(rng.integers(0, 31, size), unit='D'),
+    })
+    for column in ('country', 'product_name', 'sales_representative'):
+        frame[column] = frame[column].astype('category')
+    return frame
+
+
+def baseline(df, countries=None, row_filter=None):
+    # The pandas filtering the dashboard did before the index
+    selected = df[(df['purchase_date'] >= START) & (df['purchase_date'] <= END)]
+    if countries is not None:
+        selected = selected[selected['country'].isin(countries)]
+    if row_filter is not None:
+        column, value = row_filter
+        if column == 'age':
+            selected = selected[selected['age'].between(*value)]
+        else:
+            selected = selected[selected[column] == value]
+    return selected
+
+
+@pytest.mark.parametrize('countries, row_filter', [
+    (None, None),
+    (['US', 'DE'], None),
+    (['Atlantis'], None),
+    (['US', 'Atlantis'], None),
+    (None, ('product_name', 'Product A')),
+    (None, ('product_name', 'Product Z')),
+    (['US'], ('sales_representative', 'Rep 9')),
+    (['FR'], ('age', (30, 50))),
+])
+def test_query_matches_pandas_filtering(df, countries, row_filter):
+    summary = SalesIndex(df).query(START, END, countries, row_filter)
+    expected = baseline(df, countries, row_filter)
+    assert summary.orders == len(expected)
+    assert summary.revenue == pytest.approx(expected['purchase_amount'].sum())
+    assert summary.customers == expected['customer_id'].nunique()
+    for dimension, totals in summary.totals_by.items():
+        grouped = expected.groupby(dimension, observed=True)['purchase_amount'].sum()
+        assert dict(zip(totals[dimension], totals['purchase_amount'])) == pytest.approx(grouped.to_dict())
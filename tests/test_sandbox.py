@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sandbox import SandboxPool
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = SandboxPool(1, timeout=30)
+    yield pool
+    pool.shutdown()
+
+
+def test_frame_can_be_changed_in_place(pool):
+    df = pd.DataFrame({'a': [1.0, np.nan, 3.0], 'b': [1, 2, 3]})
+    code = "\n".join([
+        "df.loc[df['a'].isna(), 'a'] = 0",
+        "df.iloc[0, 1] = 99",
+        "df.fillna({'a': 0}, inplace=True)",
+        "df['c'] = df['a'] + df['b']",
+    ])
+    processed_df, _ = pool.run(code, df)
+    assert processed_df['a'].tolist() == [1.0, 0.0, 3.0]
+    assert processed_df['b'].tolist() == [99, 2, 3]
+    # The frame sent back to the caller is writable too
+    processed_df.loc[0, 'c'] = -1
+    assert processed_df.loc[0, 'c'] == -1
+    # and the caller's frame is untouched
+    assert df['b'].tolist() == [1, 2, 3]
+
+
+def test_errors_come_back_as_sandbox_errors(pool):
+    from sandbox import SandboxError
+
+    with pytest.raises(SandboxError):
+        pool.run("df['x'] = df['missing']", pd.DataFrame({'a': [1]}))
+
+
+def test_category_columns_reach_the_code_as_text(pool):
+    df = pd.DataFrame({
+        'first_name': pd.Categorical(['Ann', 'Bob', None]),
+        'last_name': pd.Categorical(['Lee', 'Lee', 'Kim']),
+    })
+    code = "\n".join([
+        "df['full_name'] = df['first_name'] + ' ' + df['last_name']",
+        "df['first_name'] = df['first_name'].fillna('Unknown')",
+    ])
+    processed_df, _ = pool.run(code, df)
+    assert processed_df['full_name'].tolist()[:2] == ['Ann Lee', 'Bob Lee']
+    assert processed_df['first_name'].tolist() == ['Ann', 'Bob', 'Unknown']
+    # Input columns go back to categoricals on the way out
+    assert isinstance(processed_df['first_name'].dtype, pd.CategoricalDtype)
+    assert isinstance(processed_df['last_name'].dtype, pd.CategoricalDtype)
@@ -0,0 +1,67 @@
+import importlib
+import io
+import json
+import os
+import tempfile
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+CODE = """```python
+df['b'] = df['a'] * 2
+```"""
+
+CSV = b'a\n' + b''.join(b'%d\n' % i for i in range(10))
+
+
+class Backend:
+    def generate(self, prompt):
+        return CODE
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    for name in ('CODE_CACHE_DIR', 'JOB_DIR', 'PIPELINE_DIR', 'PROFILE_DIR'):
+        monkeypatch.setenv(name, str(tmp_path / name.lower()))
+    monkeypatch.setenv('SANDBOX_WORKERS', '0')
+    monkeypatch.setenv('LLM_BACKEND', 'stub')
+    monkeypatch.setenv('STREAM_CHUNK_ROWS', '4')
+    # The spooled upload lands here, so the test can see whether it was removed
+    spool_dir = tmp_path / 'spool'
+    spool_dir.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(spool_dir))
+    import llm
+    llm.set_client(llm.LLMClient(Backend(), rate=0))
+    import app
+    app = importlib.reload(app)
+    yield app.app, spool_dir
+    llm.set_client(None)
+
+
+def upload_data():
+    return {'file': (io.BytesIO(CSV), 'data.csv'), 'stream': '1'}
+
+
+def profiles(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"event": "profile"')]
+
+
+def test_streamed_upload_cleans_up_after_the_last_chunk(client, capsys):
+    app, spool_dir = client
+    response = app.test_client().post('/upload', data=upload_data())
+    assert response.get_data(as_text=True).splitlines()[:2] == ['a,b', '0,0']
+    response.close()
+    assert os.listdir(spool_dir) == []
+    assert [profile['name'] for profile in profiles(capsys.readouterr().out)] == ['upload_file']
+
+
+def test_client_leaving_before_the_first_chunk_still_cleans_up(client, capsys):
+    app, spool_dir = client
+    # Called as a WSGI server would; the test client always reads the first chunk
+    environ = EnvironBuilder(path='/upload', method='POST', data=upload_data()).get_environ()
+    body = app(environ, lambda status, headers, exc_info=None: None)
+    assert len(os.listdir(spool_dir)) == 1
+    # Closed without reading the body, as the server does when the client disconnects
+    body.close()
+    assert os.listdir(spool_dir) == []
+    assert [profile['name'] for profile in profiles(capsys.readouterr().out)] == ['upload_file']
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sandbox import run_code
+from vectorize import format_timings, instrument, vectorize_code
+
+
+def run(code, df):
+    processed_df, timings = run_code(code, df.copy())
+    return processed_df, timings
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'a': [1, 2, 3, 4],
+        'b': [10.0, 20.0, np.nan, 40.0],
+        'name': [' Ann', 'bob ', 'Cy', 'dee'],
+    })
+
+
+def test_row_wise_apply_becomes_column_arithmetic(df):
+    code = "df['c'] = df.apply(lambda row: row['a'] * row['b'], axis=1)"
+    rewritten, rewrites, findings = vectorize_code(code)
+    assert rewritten == "df['c'] = df['a'] * df['b']"
+    assert len(rewrites) == 1
+    assert findings == []
+    pd.testing.assert_series_equal(run(rewritten, df)[0]['c'], run(code, df)[0]['c'])
+
+
+def test_conditional_becomes_np_where(df):
+    code = "df['big'] = df['a'].apply(lambda x: 'big' if x > 2 else 'small')"
+    rewritten, rewrites, _ = vectorize_code(code)
+    assert 'np.where' in rewritten and 'apply' not in rewritten
+    assert run(rewritten, df)[0]['big'].tolist() == ['small', 'small', 'big', 'big']
+
+
+def test_string_methods_use_str_accessor(df):
+    code = "df['clean'] = df['name'].apply(lambda x: x.strip().lower())\ndf['n'] = df['name'].map(lambda x: len(x))"
+    rewritten, rewrites, _ = vectorize_code(code)
+    assert "df['name'].str.strip().str.lower()" in rewritten
+    assert "df['name'].str.len()" in rewritten
+    processed_df = run(rewritten, df)[0]
+    assert processed_df['clean'].tolist() == ['ann', 'bob', 'cy', 'dee']
+    assert processed_df['n'].tolist() == [4, 4, 2, 3]
+
+
+def test_unsupported_lambdas_are_left_and_reported(df):
+    code = "df['c'] = df.apply(lambda row: some_function(row), axis=1)"
+    rewritten, rewrites, findings = vectorize_code(code)
+    assert rewritten == code
+    assert rewrites == []
+    assert [finding.kind for finding in findings] == ['row-wise apply(axis=1)']
+
+
+def test_unparsable_code_is_returned_unchanged():
+    assert vectorize_code('df[') == ('df[', [], [])
+    assert instrument('df[') == 'df['
+
+
+def test_instrument_times_each_column(df):
+    code = "\n".join([
+        "df['c'] = df['a'] * 2",
+        "for column in ['a', 'b']:",
+        "    df[f'{column}_half'] = df[column] / 2",
+    ])
+    processed_df, timings = run(instrument(code), df)
+    assert len(format_timings(timings)) == 3
+    assert {column for column, _ in timings} == {'c', 'a_half', 'b_half'}
+    assert processed_df['c'].tolist() == [2, 4, 6, 8]
+
+
+@pytest.mark.parametrize('statement', [
+    "df.iloc[1:] = df.iloc[1:]",
+    "vals = df['a'].to_numpy().copy()\nvals[1:3] = 0\ndf['v'] = vals",
+    "df.loc[df['a'] > 2, 'a':'b'] = 0",
+])
+def test_instrument_skips_slice_targets(df, statement):
+    instrumented = instrument(statement)
+    expected, _ = run(statement, df)
+    processed_df, _ = run(instrumented, df)
+    pd.testing.assert_frame_equal(processed_df, expected)
+
+
+@pytest.mark.parametrize('code', [
+    # DataFrame.apply without axis=1 passes whole columns
+    "df['n'] = len(df.columns)\nlengths = df.apply(lambda c: len(c))",
+    # Integer Series reject negative powers
+    "df['inv'] = df['a'].apply(lambda x: x ** -1)",
+    "df['p'] = df['a'].apply(lambda x: x ** df['a'].max())",
+    # A lambda that ignores its argument gives a scalar, not a Series
+    "df['five'] = df['a'].apply(lambda x: 5).sum()",
+    "s = df['a']\ndf['twice'] = s.apply(lambda x: x * 2)",
+])
+def test_rewrites_that_would_change_behaviour_are_skipped(df, code):
+    rewritten, rewrites, _ = vectorize_code(code)
+    assert rewrites == []
+    assert rewritten == code
+    run(rewritten, df)
+
+
+def test_non_negative_constant_powers_are_rewritten(df):
+    rewritten, rewrites, _ = vectorize_code("df['sq'] = df['a'].apply(lambda x: x ** 2)")
+    assert rewritten == "df['sq'] = df['a'] ** 2"
+    assert run(rewritten, df)[0]['sq'].tolist() == [1, 4, 9, 16]
@@ -0,0 +1,322 @@
+import ast
+
+# Operators that behave the same on a scalar and element-wise on a Series
+_BIN_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPS = (ast.UAdd, ast.USub)
+_COMPARE_OPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+# str methods with a Series.str equivalent taking the same constant arguments
+_STR_METHODS = {
+    'lower', 'upper', 'title', 'capitalize', 'strip', 'lstrip', 'rstrip',
+    'startswith', 'endswith', 'replace', 'zfill', 'isdigit', 'isalpha', 'isnumeric',
+}
+
+# Names injected into the exec namespace by instrument()
+TIMINGS_NAME = '__feature_timings__'
+CLOCK_NAME = '__feature_clock__'
+
+
+class Finding:
+    def __init__(self, lineno, kind, source):
+        self.lineno = lineno
+        self.kind = kind
+        self.source = source
+
+    def __str__(self):
+        return f'line {self.lineno}: {self.kind}: {self.source}'
+
+
+def _keyword(call, name):
+    for keyword in call.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    return None
+
+
+def _is_row_wise(call):
+    axis = _keyword(call, 'axis')
+    if axis is None and len(call.args) >= 2:
+        axis = call.args[1]
+    return isinstance(axis, ast.Constant) and axis.value in (1, 'columns')
+
+
+def _method_name(node):
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def find_row_wise_patterns(tree):
+    """Return Findings for row-wise or per-element Python code in a parsed module."""
+    findings = []
+    for node in ast.walk(tree):
+        method = _method_name(node)
+        if method == 'apply' and _is_row_wise(node):
+            findings.append(Finding(node.lineno, 'row-wise apply(axis=1)', ast.unparse(node)))
+        elif method in ('apply', 'map', 'applymap') and node.args and isinstance(node.args[0], ast.Lambda):
+            findings.append(Finding(node.lineno, f'element-wise {method}(lambda)', ast.unparse(node)))
+        elif method in ('iterrows', 'itertuples'):
+            findings.append(Finding(node.lineno, f'{method}() loop', ast.unparse(node)))
+        elif isinstance(node, (ast.For, ast.While)) and _loops_over_rows(node):
+            findings.append(Finding(node.lineno, 'Python loop over rows', ast.unparse(node).splitlines()[0]))
+    findings.sort(key=lambda finding: finding.lineno)
+    return findings
+
+
+def _loops_over_rows(loop):
+    # for i in range(len(df)) / for i in df.index, or any loop writing single cells with df.at/iat
+    if isinstance(loop, ast.For):
+        target = loop.iter
+        if isinstance(target, ast.Call) and isinstance(target.func, ast.Name) and target.func.id == 'range':
+            if target.args and isinstance(target.args[-1], ast.Call):
+                inner = target.args[-1]
+                if isinstance(inner.func, ast.Name) and inner.func.id == 'len':
+                    return True
+        if isinstance(target, ast.Attribute) and target.attr == 'index':
+            return True
+    for node in ast.walk(loop):
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Attribute):
+            if node.value.attr in ('at', 'iat') and isinstance(node.ctx, ast.Store):
+                return True
+    return False
+
+
+def _is_simple(node):
+    # Receivers that are cheap and side-effect free to repeat: df, df['a']
+    if isinstance(node, ast.Name):
+        return True
+    return isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) \
+        and isinstance(node.slice, ast.Constant)
+
+
+class _ScalarToSeries(ast.NodeTransformer):
+    """Turn a lambda body over a scalar (or a row) into the equivalent Series expression.
+
+    Raises ValueError for anything that is not a plain element-wise expression.
+    """
+
+    def __init__(self, param, replace, index_source):
+        self.param = param
+        self.replace = replace
+        self.index_source = index_source
+
+    def generic_visit(self, node):
+        raise ValueError(f'cannot vectorize {type(node).__name__}')
+
+    def visit_Constant(self, node):
+        return node
+
+    def visit_Name(self, node):
+        if node.id != self.param:
+            raise ValueError(f'lambda refers to outer name {node.id}')
+        result = self.replace(node)
+        if result is None:
+            raise ValueError('row used without a column subscript')
+        return result
+
+    def visit_Subscript(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id == self.param:
+            result = self.replace(node)
+            if result is not None:
+                return result
+        raise ValueError('unsupported subscript')
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BIN_OPS):
+            raise ValueError('unsupported operator')
+        if isinstance(node.op, ast.Pow):
+            # Integer Series reject negative powers that Python ints allow
+            exponent = node.right
+            if not (isinstance(exponent, ast.Constant) and isinstance(exponent.value, (int, float))
+                    and not isinstance(exponent.value, bool) and exponent.value >= 0):
+                raise ValueError('power with a negative or computed exponent')
+        return ast.BinOp(left=self.visit(node.left), op=node.op, right=self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, _UNARY_OPS):
+            return ast.UnaryOp(op=node.op, operand=self.visit(node.operand))
+        if isinstance(node.op, ast.Not) and isinstance(node.operand, ast.Compare):
+            return ast.UnaryOp(op=ast.Invert(), operand=self.visit(node.operand))
+        raise ValueError('unsupported unary operator')
+
+    def visit_Compare(self, node):
+        if len(node.ops) != 1 or not isinstance(node.ops[0], _COMPARE_OPS):
+            raise ValueError('chained or unsupported comparison')
+        return ast.Compare(left=self.visit(node.left), ops=node.ops, comparators=[self.visit(node.comparators[0])])
+
+    def visit_BoolOp(self, node):
+        # `and`/`or` of comparisons become `&`/`|` of boolean Series
+        if not all(isinstance(value, ast.Compare) for value in node.values):
+            raise ValueError('boolean operator on non-comparisons')
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        result = self.visit(node.values[0])
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=op, right=self.visit(value))
+        return result
+
+    def visit_Call(self, node):
+        # x.lower() -> s.str.lower(), len(x) -> s.str.len()
+        if node.keywords:
+            raise ValueError('unsupported call')
+        if isinstance(node.func, ast.Attribute) and node.func.attr in _STR_METHODS \
+                and all(isinstance(arg, ast.Constant) for arg in node.args):
+            value, method, args = node.func.value, node.func.attr, node.args
+        elif isinstance(node.func, ast.Name) and node.func.id == 'len' and len(node.args) == 1 \
+                and not isinstance(node.args[0], ast.Constant):
+            value, method, args = node.args[0], 'len', []
+        else:
+            raise ValueError('unsupported call')
+        accessor = ast.Attribute(value=self.visit(value), attr='str', ctx=ast.Load())
+        return ast.Call(func=ast.Attribute(value=accessor, attr=method, ctx=ast.Load()), args=args, keywords=[])
+
+    def visit_IfExp(self, node):
+        # `a if cond else b` becomes np.where, wrapped back into a Series on the original index
+        where = ast.Call(
+            func=ast.Attribute(value=ast.Name(id='np', ctx=ast.Load()), attr='where', ctx=ast.Load()),
+            args=[self.visit(node.test), self.visit(node.body), self.visit(node.orelse)],
+            keywords=[],
+        )
+        return ast.Call(
+            func=ast.Attribute(value=ast.Name(id='pd', ctx=ast.Load()), attr='Series', ctx=ast.Load()),
+            args=[where],
+            keywords=[ast.keyword(
+                arg='index',
+                value=ast.Attribute(value=self.index_source, attr='index', ctx=ast.Load()),
+            )],
+        )
+
+
+class _Vectorizer(ast.NodeTransformer):
+    def __init__(self):
+        self.rewrites = []
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        method = _method_name(node)
+        if method not in ('apply', 'map') or len(node.args) < 1 or not isinstance(node.args[0], ast.Lambda):
+            return node
+        func = node.args[0]
+        if len(func.args.args) != 1 or func.args.vararg or func.args.kwarg:
+            return node
+        param = func.args.args[0].arg
+        receiver = node.func.value
+        if not _is_simple(receiver):
+            return node
+        # A constant lambda would turn into a scalar (lambda x: 5 -> 5), not a Series
+        if not any(isinstance(child, ast.Name) and child.id == param for child in ast.walk(func.body)):
+            return node
+
+        if method == 'apply' and _is_row_wise(node):
+            # df.apply(lambda row: row['a'] * row['b'], axis=1) -> df['a'] * df['b']
+            if not isinstance(receiver, ast.Name):
+                return node
+
+            def replace(ref):
+                if isinstance(ref, ast.Subscript) and isinstance(ref.slice, ast.Constant) \
+                        and isinstance(ref.slice.value, str):
+                    return ast.Subscript(value=ast.Name(id=receiver.id, ctx=ast.Load()), slice=ref.slice, ctx=ast.Load())
+                return None
+        elif len(node.args) == 1 and not node.keywords and isinstance(receiver, ast.Subscript):
+            # df['a'].apply(lambda x: x * 2) -> df['a'] * 2; a bare name may be a DataFrame,
+            # whose apply passes whole columns rather than single values
+            def replace(ref):
+                return receiver if isinstance(ref, ast.Name) else None
+        else:
+            return node
+
+        try:
+            expression = _ScalarToSeries(param, replace, receiver).visit(func.body)
+        except ValueError:
+            return node
+
+        self.rewrites.append(f'line {node.lineno}: {ast.unparse(node)} -> {ast.unparse(expression)}')
+        return ast.copy_location(expression, node)
+
+
+def vectorize_code(code):
+    """Rewrite simple row-wise and element-wise lambdas into Series operations.
+
+    Returns (code, rewrites, findings) where findings are the row-wise patterns
+    left after rewriting. Code that does not parse is returned unchanged so the
+    normal execution path reports the syntax error.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return code, [], []
+
+    vectorizer = _Vectorizer()
+    tree = ast.fix_missing_locations(vectorizer.visit(tree))
+    if vectorizer.rewrites:
+        code = ast.unparse(tree)
+    return code, vectorizer.rewrites, find_row_wise_patterns(tree)
+
+
+def _timed_column(statement):
+    # An expression for the column label of `df['x'] = ...` / `df.loc[:, 'x'] = ...` style
+    # assignments; non-constant keys (e.g. f'{col}_len' in a loop) are evaluated at run time
+    targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+    for target in targets:
+        if isinstance(target, ast.Subscript):
+            key = target.slice
+            if isinstance(key, ast.Tuple) and key.elts:
+                key = key.elts[-1]
+            if isinstance(key, ast.Constant):
+                return repr(str(key.value))
+            # Slices (df.iloc[1:] = ..., df.loc[mask, 'a':'c'] = ...) are not column labels
+            if any(isinstance(node, ast.Slice) for node in ast.walk(key)):
+                return None
+            return f'str({ast.unparse(key)})'
+    return None
+
+
+class _Instrumenter(ast.NodeTransformer):
+    def __init__(self):
+        self.counter = 0
+
+    def _wrap_body(self, body):
+        wrapped = []
+        for statement in body:
+            self.visit(statement)
+            label = None
+            if isinstance(statement, (ast.Assign, ast.AugAssign)):
+                label = _timed_column(statement)
+            if label is None:
+                wrapped.append(statement)
+                continue
+            self.counter += 1
+            start = f'__feature_start_{self.counter}__'
+            wrapped.extend(ast.parse(f'{start} = {CLOCK_NAME}()').body)
+            wrapped.append(statement)
+            wrapped.extend(ast.parse(f'{TIMINGS_NAME}.append(({label}, {CLOCK_NAME}() - {start}))').body)
+        return wrapped
+
+    def generic_visit(self, node):
+        for field in ('body', 'orelse', 'finalbody'):
+            value = getattr(node, field, None)
+            if isinstance(value, list) and value and isinstance(value[0], ast.stmt):
+                setattr(node, field, self._wrap_body(value))
+        for handler in getattr(node, 'handlers', []):
+            handler.body = self._wrap_body(handler.body)
+        return node
+
+
+def instrument(code):
+    """Add per-column timing to every column assignment in the generated code.
+
+    The instrumented code appends (column, seconds) pairs to `__feature_timings__`
+    and reads the clock from `__feature_clock__`; the caller provides both.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return code
+    tree = ast.fix_missing_locations(_Instrumenter().visit(tree))
+    return ast.unparse(tree)
+
+
+def format_timings(timings):
+    # Aggregate repeated assignments to the same column and list the slowest first
+    totals = {}
+    for column, seconds in timings:
+        totals[column] = totals.get(column, 0.0) + seconds
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)